@@ -1,7 +1,12 @@
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import FastMCP, Image
+import argparse
 import threading
-import tkinter as tk
 import uuid
+from canvas_raster import encode_png, rasterize
+from shape_store import ShapeStore, Snapshot
+
+CANVAS_WIDTH = 600
+CANVAS_HEIGHT = 400
 
 
 # Data structure for shapes
@@ -16,38 +21,68 @@ def make_shape(shape_type, x, y, size, color):
     }
 
 
-shapes = []
+shapes = ShapeStore()
 canvas_callbacks = []
+rendered_canvas = (None, None)  # (store version, PNG bytes) of the last render_canvas call
 
 
 # Tkinter GUI for live canvas
 def start_canvas_gui():
+    import tkinter as tk  # Only needed with a display, see --headless
+
     root = tk.Tk()
     root.title("MCP Canvas")
-    canvas = tk.Canvas(root, width=600, height=400, bg="white")
+    canvas = tk.Canvas(root, width=CANVAS_WIDTH, height=CANVAS_HEIGHT, bg="white")
     canvas.pack()
 
+    items = {}  # Shape ID -> (Tk item, (x, y, size, color) it was drawn with)
+    drawn = Snapshot(0, {}, None, 0)  # Last snapshot put on screen
+
+    def bounds(shape):
+        x, y, s = shape["x"], shape["y"], shape["size"]
+        if shape["type"] == "circle":
+            return x - s, y - s, x + s, y + s
+        return x - s // 2, y - s // 2, x + s // 2, y + s // 2
+
     def redraw():
-        canvas.delete("all")
-        for shape in shapes:
-            if shape["type"] == "circle":
-                x, y, r = shape["x"], shape["y"], shape["size"]
-                canvas.create_oval(x - r, y - r, x + r, y + r, fill=shape["color"])
-            elif shape["type"] == "square":
-                x, y, s = shape["x"], shape["y"], shape["size"]
-                canvas.create_rectangle(
-                    x - s // 2, y - s // 2, x + s // 2, y + s // 2, fill=shape["color"]
-                )
-        canvas.after(100, redraw)
+        # Only apply the shapes created, moved, recolored or removed since the last frame.
+        # The snapshot is immutable, so tool calls can keep writing while this runs.
+        nonlocal drawn
+        try:
+            snapshot = shapes.snapshot
+            if snapshot.version == drawn.version:
+                return
+            if snapshot.log is drawn.log:
+                changed_ids = dict.fromkeys(snapshot.log[drawn.log_end : snapshot.log_end])
+            else:
+                changed_ids = dict.fromkeys([*snapshot.shapes, *items])  # The log was compacted, compare everything
+            for shape_id in changed_ids:
+                shape = snapshot.shapes.get(shape_id)
+                item = items.get(shape_id)
+                if shape is None:
+                    if item is not None:
+                        canvas.delete(item[0])
+                        del items[shape_id]
+                    continue
+                state = (shape["x"], shape["y"], shape["size"], shape["color"])
+                if item is None:
+                    create = canvas.create_oval if shape["type"] == "circle" else canvas.create_rectangle
+                    items[shape_id] = (create(*bounds(shape), fill=shape["color"]), state)
+                elif item[1] != state:
+                    item, (x, y, size, color) = item
+                    if (x, y, size) != state[:3]:
+                        canvas.coords(item, *bounds(shape))
+                    if color != state[3]:
+                        canvas.itemconfigure(item, fill=state[3])
+                    items[shape_id] = (item, state)
+            drawn = snapshot
+        finally:
+            canvas.after(100, redraw)
 
     canvas.after(100, redraw)
     root.mainloop()
 
 
-# Start the GUI in a background thread
-gui_thread = threading.Thread(target=start_canvas_gui, daemon=True)
-gui_thread.start()
-
 mcp = FastMCP("Canvas Demo")
 
 
@@ -66,7 +101,7 @@ def create_circle(x: int, y: int, radius: int, color: str) -> str:
         str: The unique ID of the created circle.
     """
     shape = make_shape("circle", x, y, radius, color)
-    shapes.append(shape)
+    shapes.add(shape)
     return shape["id"]
 
 
@@ -85,7 +120,7 @@ def create_square(x: int, y: int, size: int, color: str) -> str:
         str: The unique ID of the created square.
     """
     shape = make_shape("square", x, y, size, color)
-    shapes.append(shape)
+    shapes.add(shape)
     return shape["id"]
 
 
@@ -101,17 +136,9 @@ def move_shapes(new_shape_positions: list) -> bool:
     Returns:
         bool: True if all shapes were found and moved, False if any shape was not found.
     """
-    all_moved = True
-    for new_shape_position in new_shape_positions:
-        shape_found = False
-        for shape in shapes:
-            if shape["id"] == new_shape_position["id"]:
-                shape["x"] = new_shape_position["x"]
-                shape["y"] = new_shape_position["y"]
-                shape_found = True
-        if not shape_found:
-            all_moved = False
-    return all_moved
+    return shapes.move_many(
+        (position["id"], position["x"], position["y"]) for position in new_shape_positions
+    )
 
 
 @mcp.tool()
@@ -125,10 +152,7 @@ def remove_shapes(shape_ids: list) -> bool:
     Returns:
         bool: True if all shapes were found and removed, False if any shape was not found.
     """
-    global shapes
-    initial_count = len(shapes)
-    shapes = [shape for shape in shapes if shape["id"] not in shape_ids]
-    return len(shapes) < initial_count
+    return shapes.remove_many(shape_ids)
 
 
 @mcp.tool()
@@ -145,8 +169,68 @@ def get_canvas() -> list:
             - size (int): Radius (for circles) or side length (for squares)
             - color (str): Fill color
     """
-    return shapes
+    return shapes.all()
+
+
+@mcp.tool()
+def shapes_in_region(x_min: int, y_min: int, x_max: int, y_max: int) -> list:
+    """
+    Get the shapes that overlap a rectangular region of the canvas.
+
+    Args:
+        x_min (int): Left edge of the region in pixels.
+        y_min (int): Top edge of the region in pixels.
+        x_max (int): Right edge of the region in pixels.
+        y_max (int): Bottom edge of the region in pixels.
+
+    Returns:
+        list: The shapes touching the region (same format as get_canvas), bottom to top in drawing order.
+    """
+    return shapes.in_region(x_min, y_min, x_max, y_max)
+
+
+@mcp.tool()
+def shape_at_point(x: int, y: int) -> dict | None:
+    """
+    Get the shape under a point on the canvas, e.g. to find what the user is referring to.
+
+    Args:
+        x (int): X position in pixels.
+        y (int): Y position in pixels.
+
+    Returns:
+        dict | None: The topmost shape containing the point (same format as get_canvas), or None if there is none.
+    """
+    return shapes.at_point(x, y)
+
+
+@mcp.tool()
+def render_canvas() -> Image:
+    """
+    Render the canvas to an image, e.g. to check what it looks like.
+
+    Returns:
+        Image: A 600x400 PNG of the canvas, shapes drawn in creation order on a white background.
+    """
+    global rendered_canvas
+    snapshot = shapes.snapshot
+    if rendered_canvas[0] != snapshot.version:  # Re-render only after a mutation
+        image = rasterize(list(snapshot.shapes.values()), CANVAS_WIDTH, CANVAS_HEIGHT)
+        rendered_canvas = (snapshot.version, encode_png(image))
+    return Image(data=rendered_canvas[1], format="png")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="Don't open the Tk window (for hosts without a display), use render_canvas to see the canvas",
+    )
+    args = parser.parse_args()
+
+    if not args.headless:
+        # Start the GUI in a background thread
+        gui_thread = threading.Thread(target=start_canvas_gui, daemon=True)
+        gui_thread.start()
     mcp.run(transport="sse")
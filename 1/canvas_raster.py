@@ -0,0 +1,125 @@
+# Offscreen rendering of the canvas for headless mode (no Tk / display needed).
+# Shapes are turned into horizontal pixel spans with NumPy, all shapes at once, and a z-buffer keeps the
+# topmost (latest created) shape per pixel, so the image matches what the Tk canvas would show.
+import functools
+import struct
+import zlib
+
+import numpy as np
+
+BACKGROUND = (255, 255, 255)
+UNKNOWN_COLOR = (128, 128, 128)
+MAX_PIXELS_PER_CHUNK = 4_000_000  # Bounds the temporary index arrays for large or many shapes
+
+# Common Tk color names (Tk 8.6 values), anything else has to be a #rgb / #rrggbb string
+COLORS = {
+    "black": (0, 0, 0),
+    "white": (255, 255, 255),
+    "red": (255, 0, 0),
+    "green": (0, 128, 0),
+    "lime": (0, 255, 0),
+    "blue": (0, 0, 255),
+    "yellow": (255, 255, 0),
+    "orange": (255, 165, 0),
+    "purple": (128, 0, 128),
+    "pink": (255, 192, 203),
+    "brown": (165, 42, 42),
+    "cyan": (0, 255, 255),
+    "magenta": (255, 0, 255),
+    "gray": (128, 128, 128),
+    "grey": (128, 128, 128),
+    "navy": (0, 0, 128),
+    "teal": (0, 128, 128),
+    "olive": (128, 128, 0),
+    "maroon": (128, 0, 0),
+    "gold": (255, 215, 0),
+    "violet": (238, 130, 238),
+}
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_color(color):
+    color = color.strip().lower()
+    if color.startswith("#") and len(color) in (4, 7):
+        try:
+            digits = color[1:]
+            if len(digits) == 3:
+                digits = "".join(c * 2 for c in digits)
+            return tuple(int(digits[i : i + 2], 16) for i in (0, 2, 4))
+        except ValueError:
+            return UNKNOWN_COLOR
+    return COLORS.get(color.replace(" ", ""), UNKNOWN_COLOR)
+
+
+def shape_spans(shapes, width, height):
+    # One (row, first column, last column, shape index) per row of every shape, clipped to the image
+    n = len(shapes)
+    x = np.fromiter((shape["x"] for shape in shapes), dtype=np.int64, count=n)
+    y = np.fromiter((shape["y"] for shape in shapes), dtype=np.int64, count=n)
+    size = np.fromiter((shape["size"] for shape in shapes), dtype=np.int64, count=n)
+    is_circle = np.fromiter((shape["type"] == "circle" for shape in shapes), dtype=bool, count=n)
+    half = np.where(is_circle, size, size // 2).clip(min=0)  # Same extents as the Tk canvas
+
+    # Only the rows inside the image are expanded, a huge or offscreen shape costs no more than the image
+    top_row = np.maximum(y - half, 0)
+    rows_per_shape = (np.minimum(y + half, height - 1) - top_row + 1).clip(min=0)
+    shape_index = np.repeat(np.arange(n), rows_per_shape)
+    first_row = np.cumsum(rows_per_shape) - rows_per_shape
+    row = np.arange(len(shape_index)) - np.repeat(first_row - top_row, rows_per_shape)
+    dy = row - y[shape_index]
+    r = half[shape_index]
+    # In floating point, squares of very large sizes don't fit in int64
+    circle_half_width = np.floor(np.sqrt(np.maximum(r.astype(np.float64) ** 2 - dy.astype(np.float64) ** 2, 0)))
+    half_width = np.where(is_circle[shape_index], circle_half_width.astype(np.int64), r)
+
+    x0 = np.maximum(x[shape_index] - half_width, 0)
+    x1 = np.minimum(x[shape_index] + half_width, width - 1)
+    visible = x0 <= x1
+    return row[visible], x0[visible], x1[visible], shape_index[visible]
+
+
+def rasterize(shapes, width, height):
+    """
+    Draw the shapes (dicts as returned by get_canvas, bottom to top) into a (height, width, 3) uint8 RGB image.
+    """
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = BACKGROUND
+    if not shapes:
+        return image
+
+    row, x0, x1, shape_index = shape_spans(shapes, width, height)
+    top = np.full(height * width, -1, dtype=np.int64)  # Index of the topmost shape covering each pixel
+    lengths = x1 - x0 + 1
+    ends = np.cumsum(lengths)
+    start = 0
+    while start < len(lengths):
+        # Expand a chunk of spans into flat pixel indices
+        stop = max(start + 1, np.searchsorted(ends, ends[start] - lengths[start] + MAX_PIXELS_PER_CHUNK, "right"))
+        chunk_lengths = lengths[start:stop]
+        # Flat index of each span's first pixel, minus where the span starts in the chunk, plus a running count
+        span_start = row[start:stop] * width + x0[start:stop] - (np.cumsum(chunk_lengths) - chunk_lengths)
+        pixels = np.repeat(span_start, chunk_lengths) + np.arange(chunk_lengths.sum())
+        np.maximum.at(top, pixels, np.repeat(shape_index[start:stop], chunk_lengths))
+        start = stop
+
+    palette = np.array([parse_color(shape["color"]) for shape in shapes], dtype=np.uint8)
+    covered = top >= 0
+    image.reshape(-1, 3)[covered] = palette[top[covered]]
+    return image
+
+
+def encode_png(image):
+    # Minimal RGB PNG encoder (no filtering), enough for the canvas and avoids an imaging dependency
+    height, width, _ = image.shape
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)  # Each row starts with filter type 0
+    raw[:, 1:] = image.reshape(height, width * 3)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw.tobytes(), 6))
+        + chunk(b"IEND", b"")
+    )
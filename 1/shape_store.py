@@ -0,0 +1,284 @@
+# Shape store for canvas-mcp-server.py.
+# Shapes are indexed by ID (dict) and by location (uniform grid of cells, each holding the IDs of the shapes
+# whose bounding box overlaps it), so moves, removals and region/point queries don't scan every shape.
+#
+# Writers (the MCP tools) are serialized by a lock and publish an immutable Snapshot after each call. Readers
+# such as the Tk renderer just grab the latest snapshot, they never take the lock or wait for a writer.
+# Shape dicts are never modified once published: a move stores a new dict. The snapshot's ID -> shape mapping
+# is a ShapeMap, which shares all but one path of its tree with the previous version, so publishing after a
+# write costs O(log n) rather than a copy of every shape.
+import collections
+import collections.abc
+import itertools
+import math
+import threading
+
+CELL_SIZE = 50  # Pixels, about the size of a typical shape
+BRANCH_BITS = 5  # ShapeMap tree nodes have 2**BRANCH_BITS children...
+LEAF_SIZE = 32  # ...and leaves are split once they hold more than this many shapes
+MAX_SHAPE_CELLS = 256  # Shapes covering more cells than this aren't put in the grid, every query checks them
+
+# version: bumped on every change. shapes: read-only ID -> shape mapping in creation order.
+# log[:log_end]: IDs created, moved or removed so far, in order, shared by every snapshot until it is compacted.
+Snapshot = collections.namedtuple("Snapshot", ["version", "shapes", "log", "log_end"])
+
+
+def half_extent(shape):
+    # Distance from the center to the edge of the shape's bounding box, matching how the canvas draws it
+    if shape["type"] == "circle":
+        return shape["size"]
+    return shape["size"] // 2
+
+
+def contains_point(shape, x, y):
+    h = half_extent(shape)
+    if shape["type"] == "circle":
+        return (x - shape["x"]) ** 2 + (y - shape["y"]) ** 2 <= h * h
+    return abs(x - shape["x"]) <= h and abs(y - shape["y"]) <= h
+
+
+def overlaps_region(shape, x_min, y_min, x_max, y_max):
+    h = half_extent(shape)
+    if shape["type"] == "circle":
+        # Distance from the center to the closest point of the rectangle
+        dx = shape["x"] - min(max(shape["x"], x_min), x_max)
+        dy = shape["y"] - min(max(shape["y"], y_min), y_max)
+        return dx * dx + dy * dy <= h * h
+    return (
+        shape["x"] + h >= x_min
+        and shape["x"] - h <= x_max
+        and shape["y"] + h >= y_min
+        and shape["y"] - h <= y_max
+    )
+
+
+class ShapeMap(collections.abc.Mapping):
+    """
+    Immutable ID -> shape mapping, iterated in creation order.
+    A hash trie: inner nodes are tuples of children indexed by BRANCH_BITS bits of the ID's hash, leaves are
+    dicts of ID -> (creation counter, shape). set() and remove() return a new map that copies only the nodes on
+    the path to the changed leaf and shares the rest with this one.
+    """
+
+    def __init__(self, root=None, size=0):
+        self.root = root
+        self.size = size
+        self.ordered = None  # Shapes in creation order, worked out on first iteration
+
+    def find(self, shape_id):
+        node, h = self.root, hash(shape_id)
+        while isinstance(node, tuple):
+            node, h = node[h & ((1 << BRANCH_BITS) - 1)], h >> BRANCH_BITS
+        return node.get(shape_id) if node is not None else None
+
+    def __getitem__(self, shape_id):
+        entry = self.find(shape_id)
+        if entry is None:
+            raise KeyError(shape_id)
+        return entry[1]
+
+    def __contains__(self, shape_id):
+        return self.find(shape_id) is not None
+
+    def __len__(self):
+        return self.size
+
+    def entries(self, node):
+        if isinstance(node, tuple):
+            for child in node:
+                yield from self.entries(child)
+        elif node is not None:
+            yield from node.items()
+
+    def values(self):
+        if self.ordered is None:
+            self.ordered = [shape for _, (_, shape) in sorted(self.entries(self.root), key=lambda e: e[1][0])]
+        return self.ordered
+
+    def __iter__(self):
+        return (shape["id"] for shape in self.values())
+
+    def set(self, order, shape):
+        added = shape["id"] not in self
+        root = assoc(self.root, hash(shape["id"]), 0, shape["id"], (order, shape))
+        return ShapeMap(root, self.size + added)
+
+    def remove(self, shape_id):
+        if shape_id not in self:
+            return self
+        return ShapeMap(assoc(self.root, hash(shape_id), 0, shape_id, None), self.size - 1)
+
+
+def assoc(node, h, depth, key, entry):
+    # Copy of the ShapeMap node with key set to entry (removed if entry is None). h is the key's hash shifted
+    # past the bits used by the nodes above this one.
+    if isinstance(node, tuple):
+        children = list(node)
+        i = h & ((1 << BRANCH_BITS) - 1)
+        children[i] = assoc(node[i], h >> BRANCH_BITS, depth + 1, key, entry)
+        return tuple(children)
+    leaf = dict(node) if node is not None else {}
+    if entry is None:
+        leaf.pop(key, None)
+    else:
+        leaf[key] = entry
+    return split(leaf, depth) or None
+
+
+def split(leaf, depth):
+    # Leaves over LEAF_SIZE become inner nodes, on the next bits of each key's hash
+    if len(leaf) <= LEAF_SIZE or depth * BRANCH_BITS >= 64:
+        return leaf  # 64 bits of hash used up, the rest are collisions
+    children = [{} for _ in range(1 << BRANCH_BITS)]
+    for key, entry in leaf.items():
+        children[(hash(key) >> depth * BRANCH_BITS) & ((1 << BRANCH_BITS) - 1)][key] = entry
+    return tuple(split(child, depth + 1) or None for child in children)
+
+
+class ShapeStore:
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.lock = threading.Lock()  # Held by writers and index queries, never by snapshot readers
+        self.shapes = {}  # ID -> shape dict, in creation order (later shapes are drawn on top)
+        self.published = ShapeMap()  # The same shapes, for the next snapshot
+        self.order = {}  # ID -> creation counter, to find the topmost shape
+        self.cells = {}  # (column, row) -> set of IDs
+        self.large = set()  # IDs of shapes too big for the grid, see MAX_SHAPE_CELLS
+        self.counter = itertools.count()
+        self.version = 0
+        self.log = []  # Only ever appended to, replaced by a fresh list when compacted
+        self.snapshot = Snapshot(0, self.published, self.log, 0)
+
+    def cell_span(self, x_min, y_min, x_max, y_max):
+        # Columns and rows of the cells a rectangle touches, as two ranges
+        c = self.cell_size
+        return (
+            range(math.floor(x_min / c), math.floor(x_max / c) + 1),
+            range(math.floor(y_min / c), math.floor(y_max / c) + 1),
+        )
+
+    def shape_span(self, shape):
+        h = half_extent(shape)
+        return self.cell_span(shape["x"] - h, shape["y"] - h, shape["x"] + h, shape["y"] + h)
+
+    def index(self, shape):
+        columns, rows = self.shape_span(shape)
+        if len(columns) * len(rows) > MAX_SHAPE_CELLS:
+            self.large.add(shape["id"])
+            return
+        for cell in itertools.product(columns, rows):
+            self.cells.setdefault(cell, set()).add(shape["id"])
+
+    def unindex(self, shape):
+        columns, rows = self.shape_span(shape)
+        if len(columns) * len(rows) > MAX_SHAPE_CELLS:
+            self.large.discard(shape["id"])
+            return
+        for cell in itertools.product(columns, rows):
+            ids = self.cells.get(cell)
+            if ids is not None:
+                ids.discard(shape["id"])
+                if not ids:
+                    del self.cells[cell]
+
+    def touch(self, shape_id):
+        self.version += 1
+        self.log.append(shape_id)
+
+    def publish(self):
+        # Called with the lock held, once per write call so a batch shows up all at once
+        if len(self.log) > 2 * len(self.shapes) + 1024:
+            self.log = []  # Readers holding the old list notice the swap and compare everything once
+        self.snapshot = Snapshot(self.version, self.published, self.log, len(self.log))
+
+    def add(self, shape):
+        with self.lock:
+            self.shapes[shape["id"]] = shape
+            self.order[shape["id"]] = next(self.counter)
+            self.published = self.published.set(self.order[shape["id"]], shape)
+            self.index(shape)
+            self.touch(shape["id"])
+            self.publish()
+
+    def get(self, shape_id):
+        return self.snapshot.shapes.get(shape_id)
+
+    def move_many(self, new_positions):
+        # new_positions: iterable of (ID, x, y). Returns False if any ID was not found.
+        # The whole batch is read and checked first, so a malformed entry raises before anything has moved
+        moves = []
+        for shape_id, x, y in new_positions:
+            if not all(isinstance(value, (int, float)) for value in (x, y)):
+                raise ValueError(f"The position of {shape_id} must be two numbers, got ({x!r}, {y!r})")
+            moves.append((shape_id, x, y))
+        all_moved = True
+        with self.lock:
+            for shape_id, x, y in moves:
+                shape = self.shapes.get(shape_id)
+                if shape is None:
+                    all_moved = False
+                    continue
+                self.unindex(shape)
+                shape = {**shape, "x": x, "y": y}
+                self.shapes[shape_id] = shape
+                self.published = self.published.set(self.order[shape_id], shape)
+                self.index(shape)
+                self.touch(shape_id)
+            self.publish()
+        return all_moved
+
+    def remove_many(self, shape_ids):
+        # Returns False if any ID was not found
+        all_removed = True
+        with self.lock:
+            for shape_id in shape_ids:
+                shape = self.shapes.pop(shape_id, None)
+                if shape is None:
+                    all_removed = False
+                    continue
+                del self.order[shape_id]
+                self.published = self.published.remove(shape_id)
+                self.unindex(shape)
+                self.touch(shape_id)
+            self.publish()
+        return all_removed
+
+    def all(self):
+        return list(self.snapshot.shapes.values())
+
+    def candidates(self, x_min, y_min, x_max, y_max):
+        columns, rows = self.cell_span(x_min, y_min, x_max, y_max)
+        ids = set(self.large)
+        if len(columns) * len(rows) > len(self.cells):
+            # A region bigger than the occupied part of the grid: go over the occupied cells instead,
+            # so a huge region costs no more than a scan of every shape
+            for (column, row), cell_ids in self.cells.items():
+                if column in columns and row in rows:
+                    ids.update(cell_ids)
+            return ids
+        for cell in itertools.product(columns, rows):
+            ids.update(self.cells.get(cell, ()))
+        return ids
+
+    def in_region(self, x_min, y_min, x_max, y_max):
+        # Shapes overlapping the rectangle, in drawing order
+        with self.lock:
+            ids = [
+                shape_id
+                for shape_id in self.candidates(x_min, y_min, x_max, y_max)
+                if overlaps_region(self.shapes[shape_id], x_min, y_min, x_max, y_max)
+            ]
+            ids.sort(key=self.order.__getitem__)
+            return [self.shapes[shape_id] for shape_id in ids]
+
+    def at_point(self, x, y):
+        # Topmost shape under the point, or None
+        with self.lock:
+            hits = [
+                shape_id
+                for shape_id in self.candidates(x, y, x, y)
+                if contains_point(self.shapes[shape_id], x, y)
+            ]
+            if not hits:
+                return None
+            return self.shapes[max(hits, key=self.order.__getitem__)]
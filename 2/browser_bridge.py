@@ -0,0 +1,281 @@
+# Client side of the websocket bridge (websocket-bridge/ws_server.js), shared by the MCP servers in
+# p5js-canvas and swarm-simulation: the connection to the bridge, the deadlines, retries and circuit
+# breaker every browser command goes through, and the cache for reads.
+import asyncio
+import contextlib
+import itertools
+import json
+import random
+import time
+
+import websockets
+from mcp.server.fastmcp.exceptions import ToolError
+
+try:
+    import msgpack  # Optional, binary frames are smaller and quicker to parse than JSON
+except ImportError:
+    msgpack = None
+
+
+class BrowserConnection:
+    """
+    A single long-lived connection to the websocket bridge.
+    Every request is tagged with an ID, so many tool calls can be in flight at once (up to max_in_flight,
+    pipelined in call order); replies are matched back to their caller by ID rather than by arrival order.
+    The browser can also push messages without being asked, these go to the handler registered for their kind.
+    With use_msgpack, messages are MessagePack when the msgpack package is installed (the bridge translates
+    for a JSON-only browser), JSON otherwise.
+    Subclasses can add fields to every request, and time round trips, through the hooks at the end.
+    """
+
+    def __init__(self, uri, use_msgpack=False, max_in_flight=16, reconnect_delay=1.0):
+        self.uri = uri
+        self.use_msgpack = use_msgpack and msgpack is not None
+        self.max_in_flight = max_in_flight
+        self.reconnect_delay = reconnect_delay
+        self.ws = None
+        self.connected = None  # asyncio.Event, created on the server's event loop
+        self.in_flight = None  # asyncio.Semaphore, likewise
+        self.pending = {}  # request ID -> future waiting for the reply
+        self.request_ids = itertools.count()
+        self.task = None
+        self.subscriptions = {}  # command -> args, sent again whenever the bridge or the browser reconnects
+        self.push_handlers = {}  # push kind -> function called with the pushed message
+
+    def subscribe(self, cmd, args, push_kind, handler):
+        self.subscriptions[cmd] = args
+        self.push_handlers[push_kind] = handler
+
+    async def resubscribe(self):
+        for cmd, args in self.subscriptions.items():
+            try:
+                result = await self.request(cmd, args)
+                print(f"[INFO] Subscribed with {cmd}: {result}")
+            except Exception as e:
+                print(f"[WARN] Could not subscribe with {cmd}: {e!r}")
+
+    def start(self):
+        # Safe to call repeatedly, only the first call opens the connection
+        if self.task is None:
+            self.connected = asyncio.Event()
+            self.in_flight = asyncio.Semaphore(self.max_in_flight)
+            self.task = asyncio.create_task(self.run())
+
+    def encode(self, message):
+        return msgpack.packb(message) if self.use_msgpack else json.dumps(message)
+
+    @staticmethod
+    def decode(message):
+        # The bridge sends binary frames only to clients that asked for msgpack
+        return msgpack.unpackb(message) if isinstance(message, bytes) else json.loads(message)
+
+    async def run(self):
+        # Keep the connection open for the lifetime of the server, reconnecting whenever it drops
+        encodings = ["msgpack", "json"] if self.use_msgpack else ["json"]
+        while True:
+            try:
+                # Large replies are compressed, websockets negotiates permessage-deflate by default
+                async with websockets.connect(self.uri, max_size=None) as ws:
+                    # Register as python client, the handshake is JSON for any bridge version
+                    await ws.send(json.dumps({"role": "python", "encodings": encodings}))
+                    self.ws = ws
+                    self.connected.set()
+                    print(f"[INFO] Connected to websocket bridge at {self.uri}")
+                    if self.subscriptions:
+                        asyncio.create_task(self.resubscribe())
+                    async for message in ws:
+                        try:
+                            reply = self.decode(message)
+                        except ValueError as e:
+                            # The bridge passes the browser's bytes through, the caller of a reply that can't be
+                            # read runs into its deadline
+                            print(f"[WARN] Could not decode a message from the websocket bridge: {e!r}")
+                            continue
+                        if "push" in reply:
+                            handler = self.push_handlers.get(reply["push"])
+                            if handler is not None:
+                                handler(reply)
+                            continue
+                        if reply.get("event") == "browser_connected":
+                            # A reloaded sketch has forgotten its subscriptions
+                            if self.subscriptions:
+                                asyncio.create_task(self.resubscribe())
+                            continue
+                        future = self.pending.pop(reply.get("id"), None)
+                        if future is not None and not future.done():
+                            future.set_result(reply)
+            except (OSError, websockets.ConnectionClosed) as e:
+                print(f"[WARN] Websocket bridge connection lost: {e}")
+            finally:
+                self.ws = None
+                self.connected.clear()
+                # Replies to in-flight requests will never arrive on a new connection
+                for future in self.pending.values():
+                    if not future.done():
+                        future.set_exception(ConnectionError("Lost connection to the websocket bridge"))
+                self.pending.clear()
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def request(self, cmd, args=None):
+        self.start()
+        async with self.in_flight:
+            await self.connected.wait()
+            ws = self.ws
+            if ws is None:
+                raise ConnectionError("Lost connection to the websocket bridge")
+            request_id = next(self.request_ids)
+            future = asyncio.get_running_loop().create_future()
+            self.pending[request_id] = future
+            # The small fields go before args, the bridge routes by what it can read off the start of a frame
+            request = {"id": request_id, "command": cmd, **self.request_fields(), "args": args}
+            try:
+                with self.round_trip(cmd):
+                    # Sent in call order over one socket, so the browser runs them in that order too
+                    await ws.send(self.encode(request))
+                    reply = await future
+            finally:
+                self.pending.pop(request_id, None)
+        self.on_reply(cmd, reply)
+        if "result" not in reply:
+            # The bridge answers for the browser when it can't reach it, e.g. "No browser connected"
+            raise ConnectionError(reply.get("error", "No result from the browser"))
+        return reply["result"]
+
+    def request_fields(self):
+        # Extra fields sent with every request
+        return {}
+
+    def round_trip(self, cmd):
+        # Context manager around sending a request and waiting for its reply
+        return contextlib.nullcontext()
+
+    def on_reply(self, cmd, reply):
+        pass
+
+
+class CircuitBreaker:
+    """
+    Stops sending commands to a browser that keeps failing, so tool calls fail in milliseconds instead of
+    each waiting out its deadline. After the cooldown a single trial call decides whether to close again.
+    """
+
+    def __init__(self, max_failures, cooldown):
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    def retry_in(self):
+        return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+
+    def allow(self):
+        # True if a call may go ahead. While open, the first call after the cooldown is the trial,
+        # its caller has to end it with record_success(), record_failure() or end_trial()
+        if self.opened_at is None:
+            return True
+        if self.retry_in() > 0 or self.trial_running:
+            return False
+        self.trial_running = True
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_running = False
+        if self.opened_at is not None or self.failures >= self.max_failures:
+            if self.opened_at is None:
+                print(f"[WARN] Browser failed {self.failures} times in a row, failing fast for {self.cooldown} s")
+            self.opened_at = time.monotonic()
+
+    def end_trial(self):
+        # The trial ended without saying anything about the browser (cancelled, or the command itself was bad),
+        # the next call gets to be the trial instead
+        self.trial_running = False
+
+
+def browser_tool_error(kind, message, retryable):
+    # Raised out of the tool, the agent gets an error result with this JSON in it
+    return ToolError(json.dumps({"error": kind, "message": message, "retryable": retryable}))
+
+
+async def request_with_deadline(backend, breaker, cmd, args=None, deadline=10.0, retries=0, retry_backoff=0.2):
+    """
+    Send a command through the breaker, failing with a browser_tool_error after `deadline` seconds.
+    Retried up to `retries` times with backoff, only pass retries for reads (a timed out command may still have run).
+    """
+    for attempt in range(1 + retries):
+        if not breaker.allow():
+            raise browser_tool_error(
+                "browser_unavailable",
+                f"The browser is not responding, try again in {breaker.retry_in():.1f} s",
+                retryable=True,
+            )
+        is_trial = breaker.trial_running
+        try:
+            result = await asyncio.wait_for(backend.request(cmd, args), deadline)
+        except (asyncio.TimeoutError, ConnectionError, websockets.ConnectionClosed) as e:
+            breaker.record_failure()
+            if attempt < retries:
+                await asyncio.sleep(retry_backoff * 2**attempt * (1 + random.random()))
+                continue
+            if isinstance(e, asyncio.TimeoutError):
+                raise browser_tool_error(
+                    "timeout", f"The browser did not answer {cmd} within {deadline} s", retryable=True
+                ) from e
+            raise browser_tool_error("browser_unavailable", str(e), retryable=True) from e
+        else:
+            breaker.record_success()
+            return result
+        finally:
+            # Whatever else went wrong, never leave the breaker waiting on a trial that is over
+            if is_trial and breaker.trial_running:
+                breaker.end_trial()
+
+
+class ReadCache:
+    """
+    Short-lived memo of read-only browser commands.
+    Concurrent identical reads share a single request, and invalidate() (called after every other
+    command) drops cached results and keeps reads that were in flight at the time from being cached.
+    """
+
+    def __init__(self, max_age):
+        self.max_age = max_age
+        self.results = {}  # key -> (result, fetched_at)
+        self.in_flight = {}  # key -> (generation, task)
+        self.generation = 0
+
+    def invalidate(self):
+        self.generation += 1
+        self.results.clear()
+
+    def age(self, key):
+        # Seconds since the cached result for key was fetched, None if there is none
+        cached = self.results.get(key)
+        return None if cached is None else time.monotonic() - cached[1]
+
+    async def get(self, key, fetch):
+        age = self.age(key)
+        if age is not None and age < self.max_age:
+            return self.results[key][0]
+
+        flight = self.in_flight.get(key)
+        if flight is None or flight[0] != self.generation:
+            generation = self.generation
+            task = asyncio.ensure_future(fetch())
+            flight = self.in_flight[key] = (generation, task)
+
+            def done(task):
+                if self.in_flight.get(key) is flight:
+                    del self.in_flight[key]
+                if not task.cancelled() and task.exception() is None and generation == self.generation:
+                    self.results[key] = (task.result(), time.monotonic())
+
+            task.add_done_callback(done)
+        # Shielded, so one caller giving up doesn't cancel the request for the others
+        return await asyncio.shield(flight[1])
@@ -1,21 +1,57 @@
 # python_mcp_server.py
-import asyncio
-import websockets
+import os
+import sys
 import json
 from mcp.server.fastmcp import FastMCP
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from browser_bridge import BrowserConnection, CircuitBreaker, ReadCache, request_with_deadline  # noqa: E402
+
 mcp = FastMCP("Browser Controlled Game")
 
 WS_URI = "ws://localhost:8765"
+RECONNECT_DELAY = 1.0  # Seconds to wait before reconnecting to the bridge
+MAX_IN_FLIGHT = 16  # Requests sent to the browser before waiting for replies
+READ_MAX_AGE = 0.5  # Seconds a read result is reused without asking the browser
+READ_COMMANDS = {"get_canvas"}  # Also safe to send again after a failure
+# Seconds a browser command may take (including waiting for the bridge connection) before the tool call fails
+DEFAULT_DEADLINE = 10.0
+COMMAND_DEADLINES = {"get_canvas": 5.0}
+READ_RETRIES = 2
+RETRY_BACKOFF = 0.2  # Seconds before the first retry, doubled (plus jitter) for each further one
+BREAKER_FAILURES = 3  # Consecutive failures after which calls fail fast...
+BREAKER_COOLDOWN = 5.0  # ...for this many seconds, then one trial call is let through
+
+
+read_cache = ReadCache(READ_MAX_AGE)
+
+
+browser = BrowserConnection(WS_URI, max_in_flight=MAX_IN_FLIGHT, reconnect_delay=RECONNECT_DELAY)
+breaker = CircuitBreaker(BREAKER_FAILURES, BREAKER_COOLDOWN)
+
+
+def request_browser(cmd, args=None):
+    return request_with_deadline(
+        browser,
+        breaker,
+        cmd,
+        args,
+        deadline=COMMAND_DEADLINES.get(cmd, DEFAULT_DEADLINE),
+        retries=READ_RETRIES if cmd in READ_COMMANDS else 0,
+        retry_backoff=RETRY_BACKOFF,
+    )
 
 
 async def send_to_browser(cmd, args=None):
-    async with websockets.connect(WS_URI) as ws:
-        # Register as python client
-        await ws.send(json.dumps({"role": "python"}))
-        await ws.send(json.dumps({"command": cmd, "args": args}))
-        reply = await ws.recv()
-        return json.loads(reply)["result"]
+    if cmd in READ_COMMANDS:
+        return await read_cache.get(
+            (cmd, json.dumps(args, sort_keys=True)), lambda: request_browser(cmd, args)
+        )
+    try:
+        return await request_browser(cmd, args)
+    finally:
+        # Anything but a read may have changed the canvas, even if it failed part way
+        read_cache.invalidate()
 
 
 @mcp.tool()
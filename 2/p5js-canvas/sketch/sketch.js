@@ -56,7 +56,8 @@ ws.onmessage = (event) => {
   } else {
     result = { error: "Unknown command" };
   }
-  ws.send(JSON.stringify({ result }));
+  // Echo the request id so the bridge can route the reply back to its caller
+  ws.send(JSON.stringify({ id: msg.id, result }));
 };
 
 function setup() {
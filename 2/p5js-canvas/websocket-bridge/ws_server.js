@@ -1,7 +1,34 @@
 const WebSocket = require("ws");
 const wss = new WebSocket.Server({ port: 8765 });
 
-const connections = {};
+const connections = {}; // only the browser, any number of python clients (MCP servers, scripts) can connect
+const pending = new Map(); // id sent to the browser -> { socket: python socket waiting for the reply, clientId: the id it used }
+let nextBridgeId = 0;
+
+// Replies are routed back by request id. Clients pick their own ids, the bridge only swaps in one of its own
+// when a request has none (older clients) or its id is already in flight for another client.
+function forwardRequest(socket, request) {
+    let wireId = request.id;
+    if (wireId === undefined || wireId === null || pending.has(wireId)) {
+        wireId = `bridge-${nextBridgeId++}`;
+    }
+    pending.set(wireId, { socket, clientId: request.id });
+    connections.browser.send(JSON.stringify({ ...request, id: wireId }));
+}
+
+function routeReply(reply) {
+    let wireId = reply.id;
+    if (wireId === undefined) {
+        // A sketch that doesn't echo ids answers in order, so this is the oldest request
+        wireId = pending.keys().next().value;
+    }
+    const request = pending.get(wireId);
+    if (!request) return;
+    pending.delete(wireId);
+    if (request.socket.readyState === WebSocket.OPEN) {
+        request.socket.send(JSON.stringify({ ...reply, id: request.clientId }));
+    }
+}
 
 wss.on("connection", (socket) => {
     let role = null;
@@ -9,14 +36,16 @@ wss.on("connection", (socket) => {
     socket.once("message", (msg) => {
         try {
             const reg = JSON.parse(msg.toString());
-            if (reg.role === "browser" || reg.role === "python") {
+            if (reg.role === "browser") {
+                role = reg.role;
+                connections.browser = socket;
+            } else if (reg.role === "python") {
                 role = reg.role;
-                connections[role] = socket;
-                console.log(`${role} connected.`);
             } else {
                 socket.close();
                 return;
             }
+            console.log(`${role} connected.`);
         } catch {
             socket.close();
             return;
@@ -24,14 +53,34 @@ wss.on("connection", (socket) => {
 
         if (role === "python") {
             socket.on("message", (msg) => {
+                let request;
+                try {
+                    request = JSON.parse(msg.toString());
+                    if (typeof request !== "object" || request === null) throw new Error("not a JSON object");
+                } catch (e) {
+                    // Without an id there is no one to answer, so a bad frame is only logged and dropped
+                    console.log(`[WARN] Could not decode a request from a python client: ${e}`);
+                    return;
+                }
                 if (!connections.browser) {
-                    socket.send(JSON.stringify({ error: "No browser connected" }));
+                    socket.send(JSON.stringify({ id: request.id, error: "No browser connected" }));
                     return;
                 }
-                connections.browser.send(msg.toString());
-                connections.browser.once("message", (response) => {
-                    socket.send(response.toString());
-                });
+                forwardRequest(socket, request);
+            });
+        }
+
+        if (role === "browser") {
+            socket.on("message", (response) => {
+                let reply;
+                try {
+                    reply = JSON.parse(response.toString());
+                    if (typeof reply !== "object" || reply === null) throw new Error("not a JSON object");
+                } catch (e) {
+                    console.log(`[WARN] Could not decode a message from the browser: ${e}`);
+                    return;
+                }
+                routeReply(reply);
             });
         }
     });
@@ -39,9 +88,17 @@ wss.on("connection", (socket) => {
     socket.on("close", () => {
         if (role) {
             console.log(`${role} disconnected.`);
-            if (connections[role] === socket) {
-                delete connections[role];
+            // A python client's pending requests stay until the browser answers them, so in-order matching stays aligned
+            if (role === "browser" && connections.browser === socket) {
+                delete connections.browser;
+                // Their replies will never come, tell the callers instead of leaving them waiting
+                for (const request of pending.values()) {
+                    if (request.socket.readyState === WebSocket.OPEN) {
+                        request.socket.send(JSON.stringify({ id: request.clientId, error: "Browser disconnected" }));
+                    }
+                }
+                pending.clear();
             }
         }
     });
-});
\ No newline at end of file
+});
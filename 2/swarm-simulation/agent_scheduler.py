@@ -0,0 +1,116 @@
+# Decides which utterances the voice agent acts on, and when.
+# Utterances wait in a bounded queue while the agent is busy with an earlier one. Depending on the policy, a newer
+# utterance can cancel the run in progress and replace queued ones instead of waiting behind them:
+#   fifo        every utterance runs to completion, in the order spoken
+#   correction  an utterance that corrects the previous one ("no, send Bravo instead") cancels or replaces it,
+#               and runs together with it so the agent knows what is being corrected
+#   latest      only the newest utterance matters, it cancels the run in progress and drops everything queued
+import asyncio
+import collections
+import re
+
+POLICIES = ("fifo", "correction", "latest")
+# Openings that only ever mean the previous command was wrong, and "... instead" at the end
+CORRECTION_PATTERN = re.compile(
+    r"^\W*(?:nope|scratch that|never ?mind|actually|i mean|sorry|correction)\b|\binstead\W*$",
+    re.IGNORECASE,
+)
+# Openings that are also part of commands ("stop Alpha-0 encircling", "no-fly zone Kilo-0"), only a correction
+# when followed by a pause or by something that points back at the previous command ("no, ...", "cancel that")
+MAYBE_CORRECTION_PATTERN = re.compile(
+    r"^\W*(?:no|wait|cancel|stop|hold on)(?:\s*[,.!?;:]|\s*$|\s+(?:that|it|this|not|the last|the previous)\b)",
+    re.IGNORECASE,
+)
+LEADING_WORD_PATTERN = re.compile(r"^\W*(?:no|wait|cancel|stop|hold on)\s+(?P<rest>\w.*)$", re.IGNORECASE)
+
+
+def is_correction(prompt, is_command=None):
+    """
+    Whether prompt corrects the previous utterance. is_command(text), if given, says whether text is a complete
+    command on its own (e.g. the intent parser understands it). Then an opening like "wait" without a pause is
+    also taken as a correction when what follows it is a command by itself ("wait send Bravo-0 to Alpha-0"),
+    but not when it belongs to the command ("stop Alpha-0 encircling").
+    """
+    if CORRECTION_PATTERN.search(prompt) or MAYBE_CORRECTION_PATTERN.search(prompt):
+        return True
+    if is_command is None:
+        return False
+    match = LEADING_WORD_PATTERN.match(prompt)
+    return match is not None and is_command(match["rest"]) and not is_command(prompt)
+
+
+def corrected_prompt(previous, correction, started):
+    state = "was cancelled part way, some of it may already have been carried out" if started else "was not run"
+    return (
+        f"Earlier command (it {state}): {previous}\n"
+        f"Correction, carry out the earlier command as corrected by this: {correction}"
+    )
+
+
+class AgentScheduler:
+    """
+    Runs handler(utterance_id, prompt, *extra) for submitted utterances one at a time, as the policy allows.
+    submit() waits while max_pending utterances are queued, which holds up whoever feeds it.
+    is_command is passed on to is_correction.
+    """
+
+    def __init__(self, handler, policy="correction", max_pending=4, is_command=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown scheduling policy: {policy}, use one of {POLICIES}")
+        self.handler = handler
+        self.policy = policy
+        self.max_pending = max_pending
+        self.is_command = is_command  # See is_correction
+        self.pending = collections.deque()  # (utterance_id, prompt, *extra)
+        self.current = None  # (utterance, task) of the run in progress
+        self.changed = asyncio.Condition()
+
+    async def submit(self, utterance):
+        async with self.changed:
+            utterance_id, prompt, *extra = utterance
+            if self.policy == "latest":
+                self.drop_pending()
+                self.cancel_current()
+            elif self.policy == "correction" and is_correction(prompt, self.is_command):
+                if self.pending:
+                    previous = self.pending.pop()
+                    print(f"↩️  Replacing queued command: {previous[1]}")
+                    utterance = (utterance_id, corrected_prompt(previous[1], prompt, False), *extra)
+                elif self.current is not None:
+                    previous = self.current[0]
+                    self.cancel_current()
+                    utterance = (utterance_id, corrected_prompt(previous[1], prompt, True), *extra)
+            await self.changed.wait_for(lambda: len(self.pending) < self.max_pending)
+            self.pending.append(utterance)
+            self.changed.notify_all()
+
+    async def join(self):
+        # Wait until every utterance submitted so far has run, been cancelled or been dropped
+        async with self.changed:
+            await self.changed.wait_for(lambda: not self.pending and self.current is None)
+
+    def drop_pending(self):
+        for _, prompt, *_ in self.pending:
+            print(f"🗑️  Dropping queued command: {prompt}")
+        self.pending.clear()
+
+    def cancel_current(self):
+        if self.current is not None and not self.current[1].done():
+            print(f"✋ Cancelling command in progress: {self.current[0][1]}")
+            self.current[1].cancel()
+
+    async def run(self):
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: self.pending)
+                utterance = self.pending.popleft()
+                task = asyncio.create_task(self.handler(*utterance))
+                self.current = (utterance, task)
+                self.changed.notify_all()  # There is room in the queue again
+            # asyncio.wait doesn't raise when the run is cancelled, only when this loop is
+            await asyncio.wait([task])
+            async with self.changed:
+                self.current = None
+                self.changed.notify_all()
+            if not task.cancelled() and task.exception() is not None:
+                print(f"[WARN] Command failed: {utterance[1]}: {task.exception()!r}")
@@ -0,0 +1,65 @@
+# Records the WAV files utterances.json refers to, with an offline text-to-speech engine, so the benchmark's
+# transcription stage has something to transcribe. Needs pyttsx3 (pip install pyttsx3, plus espeak on Linux).
+# Files that already exist are kept, e.g. real recordings of the same commands.
+#
+#   python benchmark/make_fixtures.py
+import argparse
+import json
+import os
+import tempfile
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 16000  # What run_benchmark.py and Whisper expect, mono 16-bit
+
+
+def synthesize(engine, text, path):
+    # The engine writes at its own rate and channel count, convert to 16 kHz mono
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_path = os.path.join(tmp, "raw.wav")
+        engine.save_to_file(text, raw_path)
+        engine.runAndWait()
+        with wave.open(raw_path, "rb") as raw:
+            if raw.getsampwidth() != 2:
+                raise ValueError(f"Expected 16-bit audio from the speech engine, got {8 * raw.getsampwidth()}-bit")
+            rate, channels = raw.getframerate(), raw.getnchannels()
+            samples = np.frombuffer(raw.readframes(raw.getnframes()), dtype=np.int16)
+    samples = samples.reshape(-1, channels).mean(axis=1)
+    times = np.arange(int(len(samples) * SAMPLE_RATE / rate)) / SAMPLE_RATE
+    resampled = np.interp(times, np.arange(len(samples)) / rate, samples)
+    with wave.open(path, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(SAMPLE_RATE)
+        out.writeframes(resampled.astype(np.int16).tobytes())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--script",
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "utterances.json"),
+        help="The benchmark script whose 'audio' files to record",
+    )
+    parser.add_argument("--force", action="store_true", help="Record files that already exist again")
+    args = parser.parse_args()
+
+    import pyttsx3
+
+    with open(args.script) as f:
+        utterances = json.load(f)
+    engine = pyttsx3.init()
+    for utterance in utterances:
+        if not utterance.get("audio"):
+            continue
+        path = os.path.join(os.path.dirname(args.script), utterance["audio"])
+        if os.path.exists(path) and not args.force:
+            print(f"[INFO] Keeping {path}")
+            continue
+        synthesize(engine, utterance["text"], path)
+        print(f"[INFO] Recorded {path}: {utterance['text']}")
+
+
+if __name__ == "__main__":
+    main()
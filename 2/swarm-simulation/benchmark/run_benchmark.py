@@ -0,0 +1,248 @@
+# End-to-end latency benchmark for the voice-controlled swarm agent, runs fully offline.
+#
+# speech -> transcript -> scheduler -> fast path / plan cache / agent -> MCP tool -> bridge -> browser -> reply
+#
+# Utterances are handled by voice-controlled-agent.py's own handle_utterance and AgentScheduler, with the
+# environment prefetched while they are "spoken", so the fast path, plan cache, prefetch and scheduling are all
+# measured (see --no-fast-path and the other pipeline options). Pre-recorded utterances (16 kHz mono 16-bit WAV,
+# listed in utterances.json, made by make_fixtures.py) go through the same Whisper worker pool, a ScriptedModel
+# replaces the LLM, and a StubBrowser answers the bridge in place of the p5js sketch. The real bridge
+# (ws_server.js) and swarm-mcp-server.py are started as subprocesses, the server writing its own spans to a
+# second trace file that is merged into the report. A WAV file that is listed but missing is an error, record
+# them with make_fixtures.py or pass --no-audio to benchmark without transcription.
+#
+#   python benchmark/run_benchmark.py --iterations 20
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+import wave
+
+import numpy as np
+
+SWARM_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SWARM_DIR)
+
+from agents import set_tracing_disabled  # noqa: E402
+from agent_scheduler import AgentScheduler  # noqa: E402
+from scripted_model import ScriptedModel  # noqa: E402
+from stub_browser import StubBrowser  # noqa: E402
+from tracing import tracer  # noqa: E402
+from transcription_pool import TranscriptionPool  # noqa: E402
+
+spec = importlib.util.spec_from_file_location("voice_agent", os.path.join(SWARM_DIR, "voice-controlled-agent.py"))
+voice_agent = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(voice_agent)
+
+BRIDGE_PORT = 8765
+MCP_PORT = 8000
+# Seconds to wait after resetting the stub browser, longer than the MCP server serves a cached environment
+# (ENVIRONMENT_MAX_AGE in swarm-mcp-server.py), so the first utterance doesn't see the previous iteration's
+RESET_SETTLE = 1.0
+# Report stage -> span recorded by the voice agent's or the MCP server's tracer, None for stages the benchmark
+# times itself
+STAGES = {
+    "transcription": None,
+    "env prefetch": "environment_prefetch",
+    "fast path": "fast_path",
+    "plan replay": "plan_replay",
+    "agent run": "agent_run",
+    "tool call": "mcp_tool_call",
+    "server tool": "mcp_tool",
+    "bridge round trip": "bridge_round_trip",
+    "browser execution": None,
+    "end to end": None,
+}
+
+
+def load_wav(path):
+    with wave.open(path, "rb") as wav_file:
+        if wav_file.getframerate() != 16000 or wav_file.getnchannels() != 1 or wav_file.getsampwidth() != 2:
+            raise ValueError(f"{path} must be 16 kHz mono 16-bit PCM")
+        frames = wav_file.readframes(wav_file.getnframes())
+    return np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("localhost", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Nothing is listening on port {port}")
+
+
+def start_services(server_trace_path):
+    bridge = subprocess.Popen(
+        ["node", "ws_server.js"],
+        cwd=os.path.join(SWARM_DIR, "websocket-bridge"),
+        stdout=subprocess.DEVNULL,
+    )
+    wait_for_port(BRIDGE_PORT)
+    mcp_server = subprocess.Popen(
+        [sys.executable, "swarm-mcp-server.py", "--trace-file", server_trace_path],
+        cwd=SWARM_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    wait_for_port(MCP_PORT)
+    return [bridge, mcp_server]
+
+
+def percentile_report(samples):
+    lines = [f"{'stage':<20}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+    for stage in STAGES:
+        values = np.array(samples[stage]) * 1000
+        if len(values) == 0:
+            continue
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        lines.append(f"{stage:<20}{len(values):>7}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}")
+    return "\n".join(lines)
+
+
+def read_spans(trace_path, samples):
+    with open(trace_path) as f:
+        for line in f:
+            span = json.loads(line)
+            for stage, span_stage in STAGES.items():
+                if span["stage"] == span_stage:
+                    samples[stage].append(span["duration_ms"] / 1000)
+
+
+async def run_benchmark(args, utterances):
+    samples = {stage: [] for stage in STAGES}
+    browser = StubBrowser(f"ws://localhost:{BRIDGE_PORT}", num_drones=args.num_drones)
+    browser_task = asyncio.create_task(browser.run())
+    await browser.connected.wait()
+
+    pool = None
+    audio = {}
+    for utterance in utterances:
+        if utterance.get("audio") and not args.no_audio:
+            audio[utterance["audio"]] = load_wav(os.path.join(os.path.dirname(args.script), utterance["audio"]))
+    if audio:
+        pool = TranscriptionPool(args.transcribe_workers)
+        pool.start()
+        await asyncio.to_thread(pool.wait_until_ready)
+
+    model = ScriptedModel()
+    async with voice_agent.TracedMCPServerSse(
+        name="SSE Custom Server",
+        params={"url": f"http://localhost:{MCP_PORT}/sse"},
+        client_session_timeout_seconds=60,
+        cache_tools_list=True,
+    ) as server:
+        # Same agent and pipeline as voice-controlled-agent.py, only the model is swapped out
+        agent = voice_agent.build_agent(server, model)
+        voice_agent.configure_pipeline(args, server, await server.list_tools())
+
+        async def handle(utterance_id, prompt, prefetch, turns, started):
+            model.load(turns)
+            await voice_agent.handle_utterance(agent, server, utterance_id, prompt, prefetch)
+            samples["end to end"].append(time.perf_counter() - started)
+
+        scheduler = AgentScheduler(
+            handle, voice_agent.schedule_policy, voice_agent.MAX_PENDING_UTTERANCES, voice_agent.is_command
+        )
+        scheduler_task = asyncio.create_task(scheduler.run())
+        loop = asyncio.get_running_loop()
+        for iteration in range(args.iterations):
+            browser.reset()
+            await asyncio.sleep(RESET_SETTLE)
+            for utterance in utterances:
+                # Like pressing [SPACE]: the environment is read while the utterance is spoken and transcribed
+                utterance_id = uuid.uuid4().hex[:12]
+                utterance_start = time.perf_counter()
+                prefetch = None
+                if voice_agent.prefetch_enabled:
+                    prefetch = asyncio.run_coroutine_threadsafe(
+                        voice_agent.prefetch_environment(utterance_id), loop
+                    )
+                text = utterance["text"]
+                if utterance.get("audio") in audio:
+                    future = pool.submit(audio[utterance["audio"]])
+                    text = (await asyncio.wrap_future(future))["text"]
+                    samples["transcription"].append(time.perf_counter() - utterance_start)
+                # The next utterance is transcribed while this one is handled, as with a live operator
+                await scheduler.submit((utterance_id, text, prefetch, utterance["turns"], utterance_start))
+            # Every iteration starts from the initial scenario, so the last one has to be done with it
+            await scheduler.join()
+            print(f"[INFO] Iteration {iteration + 1}/{args.iterations} done.")
+        scheduler_task.cancel()
+
+    samples["browser execution"] = browser.exec_times
+    browser_task.cancel()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--script",
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "utterances.json"),
+        help="JSON list of utterances, each with 'text', optional 'audio' (WAV path) and scripted 'turns'",
+    )
+    voice_agent.add_pipeline_args(parser)
+    parser.add_argument("--iterations", type=int, default=10, help="Times to replay the whole script")
+    parser.add_argument("--num-drones", type=int, default=1000, help="Drones in the stub browser's simulation")
+    parser.add_argument("--transcribe-workers", type=int, default=1, help="Whisper worker processes")
+    parser.add_argument(
+        "--no-audio", action="store_true", help="Use every utterance's text and skip transcription"
+    )
+    parser.add_argument(
+        "--no-launch",
+        action="store_true",
+        help="Use an already running bridge and MCP server instead of starting them",
+    )
+    parser.add_argument("--output", help="Also write the raw per-stage samples (seconds) to this JSON file")
+    args = parser.parse_args()
+
+    with open(args.script) as f:
+        utterances = json.load(f)
+    if not args.no_audio:
+        missing = [
+            utterance["audio"]
+            for utterance in utterances
+            if utterance.get("audio")
+            and not os.path.exists(os.path.join(os.path.dirname(args.script), utterance["audio"]))
+        ]
+        if missing:
+            parser.error(
+                f"missing audio fixtures {', '.join(missing)}, "
+                "record them with benchmark/make_fixtures.py or pass --no-audio to skip transcription"
+            )
+
+    set_tracing_disabled(True)  # Nothing leaves the machine
+    trace_dir = tempfile.mkdtemp()
+    trace_paths = [os.path.join(trace_dir, "spans.jsonl")]
+    tracer.configure("benchmark", trace_paths[0])
+    services = []
+    if not args.no_launch:
+        trace_paths.append(os.path.join(trace_dir, "server-spans.jsonl"))
+        services = start_services(trace_paths[1])
+    try:
+        samples = asyncio.run(run_benchmark(args, utterances))
+    finally:
+        for service in services:
+            service.terminate()
+            service.wait()  # So the server's last spans are written before they are read
+    for trace_path in trace_paths:
+        read_spans(trace_path, samples)
+
+    print(percentile_report(samples))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(samples, f)
+
+
+if __name__ == "__main__":
+    main()
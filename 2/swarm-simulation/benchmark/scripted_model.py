@@ -0,0 +1,82 @@
+# Deterministic stand-in for the LLM, for benchmarks.
+# Each utterance comes with a script: a list of turns, each turn a list of tool calls. Every model call
+# answers with the next turn's tool calls, and once the script is used up with a short final message.
+# Streamed runs get the same answer as a single response.completed event.
+import json
+import time
+
+from agents.items import ModelResponse
+from agents.models.interface import Model
+from agents.usage import Usage
+from openai.types.responses import (
+    Response,
+    ResponseCompletedEvent,
+    ResponseFunctionToolCall,
+    ResponseOutputMessage,
+    ResponseOutputText,
+)
+
+
+class ScriptedModel(Model):
+    def __init__(self):
+        self.turns = []
+        self.num_calls = 0
+
+    def load(self, turns):
+        self.turns = list(turns)
+
+    async def get_response(
+        self,
+        system_instructions,
+        input,
+        model_settings,
+        tools,
+        output_schema,
+        handoffs,
+        tracing,
+        **kwargs,
+    ):
+        if self.turns:
+            output = []
+            for call in self.turns.pop(0):
+                self.num_calls += 1
+                output.append(
+                    ResponseFunctionToolCall(
+                        id=f"fc_{self.num_calls}",
+                        call_id=f"call_{self.num_calls}",
+                        name=call["name"],
+                        arguments=json.dumps(call.get("arguments", {})),
+                        type="function_call",
+                        status="completed",
+                    )
+                )
+        else:
+            output = [
+                ResponseOutputMessage(
+                    id="msg_scripted",
+                    role="assistant",
+                    status="completed",
+                    type="message",
+                    content=[
+                        ResponseOutputText(text="Done.", type="output_text", annotations=[])
+                    ],
+                )
+            ]
+        return ModelResponse(output=output, usage=Usage(requests=1), response_id=None)
+
+    async def stream_response(self, *args, **kwargs):
+        response = await self.get_response(*args, **kwargs)
+        yield ResponseCompletedEvent(
+            type="response.completed",
+            sequence_number=0,
+            response=Response(
+                id=f"resp_{self.num_calls}",
+                created_at=time.time(),
+                model="scripted",
+                object="response",
+                output=response.output,
+                parallel_tool_calls=True,
+                tool_choice="auto",
+                tools=[],
+            ),
+        )
@@ -0,0 +1,83 @@
+# Python stand-in for the p5js sketch, for benchmarks.
+# Registers with the websocket bridge as the browser and answers the mcp.js command protocol
+# from a headless SwarmEngine, recording how long each command took to execute.
+# Like mcp.js it asks the bridge for MessagePack frames when it can (here: when msgpack is installed).
+import asyncio
+import json
+import time
+
+import websockets
+
+from swarm_engine import SwarmEngine
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class StubBrowser:
+    def __init__(self, uri, num_drones=1000, seed=0, tick_rate=60, use_msgpack=True):
+        self.uri = uri
+        self.num_drones = num_drones
+        self.seed = seed
+        self.tick_interval = 1.0 / tick_rate
+        self.engine = SwarmEngine(num_drones=num_drones, seed=seed)
+        self.exec_times = []  # Seconds spent executing each command
+        self.connected = asyncio.Event()
+        self.pusher = None  # Task pushing environment snapshots, see subscribe_environment in mcp.js
+        self.use_msgpack = use_msgpack and msgpack is not None
+
+    def encode(self, message):
+        return msgpack.packb(message) if self.use_msgpack else json.dumps(message)
+
+    def reset(self):
+        # Back to the initial scenario, so every benchmark iteration sees the same IDs
+        self.engine = SwarmEngine(num_drones=self.num_drones, seed=self.seed)
+
+    async def tick(self):
+        # Keep the simulation moving like the sketch's draw() loop
+        while True:
+            self.engine.step()
+            await asyncio.sleep(self.tick_interval)
+
+    async def push_environment(self, ws, rate):
+        last_pushed = None
+        while True:
+            environment = self.engine.get_environment()
+            if environment != last_pushed:
+                last_pushed = environment
+                await ws.send(self.encode({"push": "environment", "environment": environment}))
+            await asyncio.sleep(1.0 / rate)
+
+    def subscribe_environment(self, ws, rate):
+        if self.pusher is not None:
+            self.pusher.cancel()
+            self.pusher = None
+        if not rate or rate <= 0:
+            return False
+        self.pusher = asyncio.create_task(self.push_environment(ws, rate))
+        return True
+
+    async def run(self):
+        async with websockets.connect(self.uri, max_size=None) as ws:
+            encodings = ["msgpack", "json"] if self.use_msgpack else ["json"]
+            await ws.send(json.dumps({"role": "browser", "encodings": encodings}))
+            self.connected.set()
+            ticker = asyncio.create_task(self.tick())
+            try:
+                async for message in ws:
+                    msg = msgpack.unpackb(message) if isinstance(message, bytes) else json.loads(message)
+                    exec_start = time.perf_counter()
+                    try:
+                        if msg["command"] == "subscribe_environment":
+                            result = self.subscribe_environment(ws, (msg.get("args") or {}).get("rate"))
+                        else:
+                            result = self.engine.execute(msg["command"], msg.get("args"))
+                    except (ValueError, TypeError) as e:
+                        result = {"error": str(e)}
+                    self.exec_times.append(time.perf_counter() - exec_start)
+                    await ws.send(self.encode({"id": msg.get("id"), "result": result}))
+            finally:
+                ticker.cancel()
+                self.subscribe_environment(ws, 0)
@@ -0,0 +1,208 @@
+# Deterministic parser for spoken commands that map directly onto MCP tool calls,
+# e.g. "merge Bravo-0 into Alpha-0" or "Charlie-0 encircle car Delta-0 radius 80".
+# The grammar is built from the tool list the MCP server reports: a phrase is only used if every tool it calls
+# exists and its slots (plus constants) cover the tools' required parameters, and each slot is parsed according
+# to the type in the tool's input schema. Entity IDs follow the phonetic scheme of speakable_ids.js.
+# Anything that doesn't parse to exactly one plan is left to the agent.
+import re
+
+from swarm_engine import PHONETIC_NAMES
+
+# Other ways transcriptions spell the names, after normalize()
+NAME_ALIASES = {"alfa": "Alpha", "juliett": "Juliet", "whisky": "Whiskey", "x ray": "Xray"}
+
+NUMBER_WORDS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9,
+    "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15, "sixteen": 16,
+    "seventeen": 17, "eighteen": 18, "nineteen": 19, "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50,
+    "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+}
+SCALE_WORDS = {"hundred": 100, "thousand": 1000}
+
+FILLER_PREFIX = re.compile(r"^(?:(?:ok|okay|alright|so|now|please|and|um|uh|hey)\s)+")
+FILLER_SUFFIX = re.compile(r"(?:\s(?:please|thanks|thank you|now))+$")
+
+_name_words = sorted([name.lower() for name in PHONETIC_NAMES] + list(NAME_ALIASES), key=len, reverse=True)
+_number_word = "|".join(sorted(list(NUMBER_WORDS) + list(SCALE_WORDS), key=len, reverse=True))
+ID_PATTERN = (
+    r"(?:the )?(?:swarm |car |landmark |no fly zone )?"
+    rf"(?:{'|'.join(_name_words)}) (?:\d+|{'|'.join(NUMBER_WORDS)})"
+)
+DIGITS = r"-?\d+(?:\.\d+)?"  # Signed, so "-100" doesn't turn into 100
+NUMBER_PATTERN = rf"(?:{DIGITS}|(?:{_number_word})(?: (?:and )?(?:{_number_word}))*)"
+SLOT_PATTERNS = {"string": ID_PATTERN, "integer": NUMBER_PATTERN, "number": NUMBER_PATTERN}
+
+# (phrases, calls): each call is (tool name, constant arguments), its other arguments come from the phrase's
+# slots of the same name. Phrases are regexes over normalize()d text, with {param} for a slot.
+# Spoken numbers next to each other can be split several ways ("one hundred two hundred"), so between
+# coordinates said in words there has to be a "y" or "by", see IntentParser.parse
+_position = r"(?:position |point |coordinates )?(?:x )?{x} (?:(?:y|by) )?{y}"
+INTENTS = [
+    (
+        [r"merge {source_swarm_id} (?:in ?to|with) {target_swarm_id}"],
+        [("merge_swarm", {})],
+    ),
+    (
+        [r"(?:move|send|reassign|transfer|give) {num_drones} drones from {source_swarm_id} to {target_swarm_id}"],
+        [("reassign_drones", {})],
+    ),
+    (
+        [r"(?:split|fork|send|take) {num_drones} drones (?:from|of) {source_swarm_id} (?:to )?(?:follow|track) {target_id}"],
+        [("fork_swarm_to_follow", {})],
+    ),
+    (
+        [r"(?:split|fork|send|take) {num_drones} drones (?:from|of) {source_swarm_id} to " + _position],
+        [("fork_swarm_to_position", {})],
+    ),
+    (
+        [
+            r"(?:have |make |tell )?{swarm_id} (?:to )?(?:follow|track|go to) {target_id}",
+            r"(?:send|move) {swarm_id} to {target_id}",
+        ],
+        [("assign_swarm_to_follow", {})],
+    ),
+    (
+        [
+            r"(?:send|move) {swarm_id} to " + _position,
+            r"{swarm_id} (?:go|move) to " + _position,
+        ],
+        [("assign_swarm_to_position", {})],
+    ),
+    (
+        [r"(?:have |make |tell )?{swarm_id} (?:to )?(?:encircle|circle|surround) (?:its target )?(?:with |at )?(?:a )?radius (?:of )?{radius}"],
+        [("set_swarm_encircle", {"is_encircling": True})],
+    ),
+    (
+        [r"(?:have |make |tell )?{swarm_id} (?:to )?(?:encircle|circle|surround) {target_id} (?:with |at )?(?:a )?radius (?:of )?{radius}"],
+        [("assign_swarm_to_follow", {}), ("set_swarm_encircle", {"is_encircling": True})],
+    ),
+]
+
+
+def normalize(text):
+    # Lowercase words and numbers separated by single spaces, so "Alpha-0," and "alpha 0" read the same.
+    # A minus sign is kept when it starts a number ("to -100 200"), not when it joins a name and a number
+    text = " ".join(re.findall(r"(?<![a-z\d])-\d+(?:\.\d+)?|\d+(?:\.\d+)?|[a-z]+", text.lower()))
+    text = FILLER_PREFIX.sub("", text)
+    return FILLER_SUFFIX.sub("", text)
+
+
+def parse_number(text):
+    # "80", "-80.5", "eighty", "one hundred and twenty"
+    if re.fullmatch(DIGITS, text):
+        return float(text) if "." in text else int(text)
+    total = current = 0
+    for word in text.split():
+        if word == "and":
+            continue
+        if word in NUMBER_WORDS:
+            current += NUMBER_WORDS[word]
+        elif word == "hundred":
+            current = max(current, 1) * 100
+        else:
+            total += max(current, 1) * SCALE_WORDS[word]
+            current = 0
+    return total + current
+
+
+def parse_id(text):
+    # "car delta zero" -> "Delta-0"
+    words = text.split()
+    while words[0] in ("the", "swarm", "car", "landmark", "no", "fly", "zone"):
+        words = words[1:]
+    name = " ".join(words[:-1])
+    name = NAME_ALIASES.get(name, name.capitalize())
+    return f"{name}-{parse_number(words[-1])}"
+
+
+class IntentParser:
+    """
+    Turns an utterance into a list of (tool name, arguments) calls, or None when it doesn't match exactly one
+    plan. IDs are only checked for their form here, see check_ids for checking them against the environment.
+    """
+
+    def __init__(self, tools):
+        schemas = {tool.name: tool.inputSchema for tool in tools}
+        self.param_types = {}  # (tool, param) -> JSON schema type
+        self.grammar = []  # (compiled phrase, calls, number slots)
+        for phrases, calls in INTENTS:
+            if any(name not in schemas for name, _ in calls):
+                continue
+            slot_types = {}
+            for name, _ in calls:
+                for param, schema in schemas[name].get("properties", {}).items():
+                    self.param_types[name, param] = schema.get("type")
+                    slot_types.setdefault(param, schema.get("type"))
+            for phrase in phrases:
+                slots = set(re.findall(r"{(\w+)}", phrase))
+                covered = all(
+                    set(schemas[name].get("required", [])) <= slots | set(constants) for name, constants in calls
+                )
+                if not covered or any(slot_types.get(slot) not in SLOT_PATTERNS for slot in slots):
+                    continue
+                pattern = re.sub(
+                    r"{(\w+)}", lambda m: f"(?P<{m[1]}>{SLOT_PATTERNS[slot_types[m[1]]]})", phrase
+                )
+                number_slots = [slot for slot in slots if slot_types[slot] in ("integer", "number")]
+                self.grammar.append((re.compile(pattern), calls, number_slots))
+
+    def parse(self, text):
+        text = normalize(text)
+        plans = []
+        for pattern, calls, number_slots in self.grammar:
+            match = pattern.fullmatch(text)
+            if match is None:
+                continue
+            if splits_ambiguously(match, number_slots):
+                return None
+            plan = []
+            for name, constants in calls:
+                args = dict(constants)
+                for param, value in match.groupdict().items():
+                    param_type = self.param_types.get((name, param))
+                    if param_type == "string":
+                        args[param] = parse_id(value)
+                    elif param_type == "integer":
+                        number = parse_number(value)
+                        if number != int(number):
+                            return None  # "2.5 drones", not something to round on the operator's behalf
+                        args[param] = int(number)
+                    elif param_type == "number":
+                        args[param] = parse_number(value)
+                plan.append((name, args))
+            if plan not in plans:
+                plans.append(plan)
+        # Several different readings of the same words are for the agent to sort out
+        return plans[0] if len(plans) == 1 else None
+
+
+def splits_ambiguously(match, number_slots):
+    # Numbers with only a space between them are only unambiguous as digits:
+    # "one hundred two hundred" could be 100 and 200 or 102 and 100
+    spans = sorted(match.span(slot) for slot in number_slots)
+    for (start, end), (next_start, next_end) in zip(spans, spans[1:]):
+        if match.string[end:next_start].strip():
+            continue  # Something like "y" or "by" in between
+        spoken = match.string[start:end], match.string[next_start:next_end]
+        if not all(re.fullmatch(DIGITS, number) for number in spoken):
+            return True
+    return False
+
+
+def check_ids(plan, environment):
+    # The sketch doesn't validate IDs itself, so a misheard ID must never reach it:
+    # swarm parameters have to name a swarm, target_id any entity a swarm can follow.
+    # Merging or reassigning a swarm into itself is a mishearing too
+    swarms = {swarm["id"] for swarm in environment.get("swarms", [])}
+    followable = swarms | {
+        entity["id"] for category in ("cars", "landmarks") for entity in environment.get(category, [])
+    }
+    for _, args in plan:
+        for param, value in args.items():
+            if param.endswith("swarm_id") and value not in swarms:
+                return False
+            if param == "target_id" and value not in followable:
+                return False
+        if "source_swarm_id" in args and args["source_swarm_id"] == args.get("target_swarm_id"):
+            return False
+    return True
@@ -0,0 +1,153 @@
+# Cache of the tool calls the agent made for a command, so a repeated command is replayed without the LLM.
+# Entries are looked up by the normalized transcript and only used while the environment still has the entities
+# the plan refers to, and are evicted when the cache is full (least recently used first) or too old.
+import collections
+import json
+import time
+
+from intent_parser import normalize
+
+READ_TOOLS = {"get_environment", "get_environment_delta"}  # Not replayed, they don't change anything
+ENTITY_CATEGORIES = ("swarms", "cars", "landmarks")
+
+
+def entity_categories(environment):
+    return {
+        entity["id"]: category for category in ENTITY_CATEGORIES for entity in environment.get(category, [])
+    }
+
+
+def strings_in(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, list):
+        for item in value:
+            yield from strings_in(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from strings_in(item)
+
+
+def plan_fingerprint(calls, environment):
+    """
+    The entities a plan depends on: every existing entity it names, and for a category it named every entity
+    of (e.g. "regroup everyone" merging all swarms), the exact set of that category's IDs.
+    """
+    categories = entity_categories(environment)
+    referenced = {value for _, args, _ in calls for value in strings_in(args) if value in categories}
+    required = frozenset((categories[id], id) for id in referenced)
+    exact = []
+    for category in ENTITY_CATEGORIES:
+        ids = sorted(id for id, id_category in categories.items() if id_category == category)
+        if len(ids) > 1 and referenced.issuperset(ids):
+            exact.append((category, tuple(ids)))
+    return required, tuple(exact)
+
+
+def matches(fingerprint, environment):
+    required, exact = fingerprint
+    categories = entity_categories(environment)
+    if any(categories.get(id) != category for category, id in required):
+        return False
+    return all(
+        tuple(sorted(id for id, id_category in categories.items() if id_category == category)) == ids
+        for category, ids in exact
+    )
+
+
+def tool_result(result):
+    """
+    The return value of a tool from its CallToolResult. FastMCP sends it as structured content, with anything but
+    a dict (lists, strings, booleans) wrapped in {"result": ...}, and as text, a list as one block per item.
+    """
+    structured = result.structuredContent
+    if structured is not None and not result.isError:
+        return structured["result"] if set(structured) == {"result"} else structured
+    values = []
+    for block in result.content:
+        text = getattr(block, "text", None)
+        try:
+            values.append(json.loads(text))
+        except (TypeError, ValueError):
+            values.append(text)
+    if not values:
+        return None
+    return values[0] if len(values) == 1 else values
+
+
+def substitute(value, ids):
+    # Swap IDs created by the recorded plan for the ones created during the replay
+    if isinstance(value, str):
+        return ids.get(value, value)
+    if isinstance(value, list):
+        return [substitute(item, ids) for item in value]
+    if isinstance(value, dict):
+        return {key: substitute(item, ids) for key, item in value.items()}
+    return value
+
+
+def created_id(args, result):
+    # Forks return the ID of the new swarm, other string results (e.g. merge_swarm's target) were arguments
+    if isinstance(result, str) and result not in args.values():
+        return result
+    return None
+
+
+def failed(result, recorded_result):
+    if isinstance(result, dict) and "error" in result:
+        return True
+    if isinstance(result, list):
+        # execute_commands: one {"result": ...} per step that ran, it stops at the first failed step,
+        # so every recorded step has to have run again and each judged like a call of its own
+        recorded_steps = recorded_result if isinstance(recorded_result, list) else []
+        if len(result) != len(recorded_steps):
+            return True
+        return any(
+            not isinstance(step, dict)
+            or "result" not in step
+            or failed(step["result"], recorded.get("result") if isinstance(recorded, dict) else None)
+            for step, recorded in zip(result, recorded_steps)
+        )
+    # e.g. reassign_drones returns False when a swarm doesn't exist
+    return result is False and recorded_result is not False
+
+
+class PlanCache:
+    """
+    LRU map from a normalized transcript to the mutating tool calls the agent made for it, as
+    (tool name, arguments, result) tuples, plus the fingerprint of the environment they were made in.
+    Entries older than max_age seconds, or whose entities no longer exist, are never used.
+    """
+
+    def __init__(self, max_entries, max_age):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.entries = collections.OrderedDict()  # normalized transcript -> (calls, fingerprint, stored_at)
+
+    def get(self, transcript, environment):
+        key = normalize(transcript)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        calls, fingerprint, stored_at = entry
+        if time.monotonic() - stored_at > self.max_age:
+            del self.entries[key]
+            return None
+        if not matches(fingerprint, environment):
+            return None  # Kept, the entities may come back (e.g. a swarm that was merged away and forked again)
+        self.entries.move_to_end(key)
+        return calls
+
+    def put(self, transcript, environment, calls):
+        # `environment` is the one the agent started from
+        calls = [call for call in calls if call[0] not in READ_TOOLS]
+        if not calls:
+            return  # Nothing to replay, e.g. a question about the environment
+        key = normalize(transcript)
+        self.entries[key] = (calls, plan_fingerprint(calls, environment), time.monotonic())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, transcript):
+        self.entries.pop(normalize(transcript), None)
@@ -0,0 +1,192 @@
+# What the voice agent remembers between utterances, so follow-ups like "now send them back" work without
+# re-deriving everything from the environment.
+# Recent turns are kept word for word. Once they no longer fit the token budget, the oldest are folded into a
+# rolling summary of one line per command plus the latest known state of every swarm acted on, and the oldest
+# summary lines are dropped in turn, so the memory's share of the prompt never grows past the budget.
+import collections
+import re
+
+from swarm_engine import STEP_REFERENCE
+
+READ_TOOLS = {"get_environment", "get_environment_delta"}
+SUMMARY_LINE_CHARS = 200  # Summary lines are cut off after this many characters
+# Words that make a command mean something different depending on what came before
+CONTEXT_WORDS = re.compile(
+    r"\b(?:them|they|it|its|those|these|that|this|back|again|same|other|others|previous|last|undo)\b",
+    re.IGNORECASE,
+)
+
+
+def refers_to_context(prompt):
+    return CONTEXT_WORDS.search(prompt) is not None
+
+
+def estimate_tokens(text):
+    # Roughly 4 characters per token for English and JSON, close enough for a budget
+    return len(text) // 4 + 1
+
+
+def describe_target(target):
+    if target is None:
+        return "no target"
+    if "id" in target:
+        return f"following {target['type']} {target['id']}"
+    if target.get("type") == "waypoints":
+        return f"flying {len(target['waypoints'])} waypoints"
+    position = target.get("position", {})
+    return f"heading to ({position.get('x')}, {position.get('y')})"
+
+
+def describe_call(name, args, result):
+    return f"{name}({', '.join(f'{k}={v!r}' for k, v in args.items())}) -> {result}"
+
+
+def summarize_turn(prompt, calls):
+    # One line per command: what was said and which changes it made, without argument names or results
+    changes = "; ".join(f"{name}({', '.join(str(value) for value in args.values())})" for name, args, _ in calls)
+    line = f"- {prompt.strip()} -> {changes or 'no changes'}"
+    return line if len(line) <= SUMMARY_LINE_CHARS else line[: SUMMARY_LINE_CHARS - 3] + "..."
+
+
+def succeeded(name, result):
+    # Failed commands answer with an error, or False (e.g. reassign_drones when a swarm doesn't exist);
+    # set_swarm_encircle's False is the new encircling state
+    if isinstance(result, dict) and "error" in result:
+        return False
+    return result is not False or name == "set_swarm_encircle"
+
+
+def succeeded_steps(calls):
+    # The (tool name, arguments, result) calls that went through, with execute_commands split into the steps
+    # that ran and their "$<n>" references replaced by the results they refer to
+    steps = []
+    for name, args, result in calls:
+        if name != "execute_commands":
+            if succeeded(name, result):
+                steps.append((name, args, result))
+            continue
+        if not isinstance(result, list):
+            continue
+        results = []
+        for step, step_result in zip(args.get("commands", []), result):
+            if not isinstance(step_result, dict) or "result" not in step_result:
+                break  # execute_commands stops at the first failed step
+            step_args = {}
+            for key, value in (step.get("args") or {}).items():
+                match = STEP_REFERENCE.match(value) if isinstance(value, str) else None
+                if match and int(match.group(1)) < len(results):
+                    value = results[int(match.group(1))]
+                step_args[key] = value
+            results.append(step_result["result"])
+            if succeeded(step.get("command"), step_result["result"]):
+                steps.append((step.get("command"), step_args, step_result["result"]))
+    return steps
+
+
+def reply_text(output, calls):
+    lines = [output] if output else []
+    if calls:
+        lines.append("Tool calls: " + "; ".join(describe_call(*call) for call in calls))
+    return "\n".join(lines) or "Nothing to do."
+
+
+class SessionMemory:
+    def __init__(self, token_budget):
+        self.token_budget = token_budget
+        self.turns = collections.deque()  # (prompt, reply, calls) of recent commands
+        self.summary = collections.deque()  # One line per command folded out of the recent turns
+        self.swarms = collections.OrderedDict()  # swarm ID -> what was last done to it, most recent last
+
+    def note_swarm(self, swarm_id, note):
+        self.swarms[swarm_id] = note
+        self.swarms.move_to_end(swarm_id)
+
+    def track_swarms(self, calls, environment):
+        # environment: as it was before the calls, to say where a swarm was sent from.
+        # Only commands that went through change what is remembered about a swarm.
+        before = {swarm["id"]: swarm for swarm in (environment or {}).get("swarms", [])}
+
+        def was(swarm_id):
+            swarm = before.get(swarm_id)
+            return f" (was {describe_target(swarm.get('target'))})" if swarm else ""
+
+        for name, args, result in succeeded_steps(calls):
+            if name == "assign_swarm_to_follow":
+                self.note_swarm(args["swarm_id"], f"following {args['target_id']}{was(args['swarm_id'])}")
+            elif name == "assign_swarm_to_position":
+                self.note_swarm(args["swarm_id"], f"heading to ({args['x']}, {args['y']}){was(args['swarm_id'])}")
+            elif name == "assign_swarm_to_waypoints":
+                self.note_swarm(args["swarm_id"], f"flying {len(args['waypoints'])} waypoints{was(args['swarm_id'])}")
+            elif name.startswith("fork_swarm_to_") and isinstance(result, str):
+                if name == "fork_swarm_to_follow":
+                    goal = f"following {args['target_id']}"
+                elif name == "fork_swarm_to_position":
+                    goal = f"heading to ({args['x']}, {args['y']})"
+                else:
+                    goal = f"flying {len(args['waypoints'])} waypoints"
+                self.note_swarm(result, f"forked from {args['source_swarm_id']} with {args['num_drones']} drones, {goal}")
+            elif name == "merge_swarm":
+                self.note_swarm(args["source_swarm_id"], f"merged into {args['target_swarm_id']}, no longer exists")
+            elif name == "reassign_drones":
+                self.note_swarm(args["source_swarm_id"], f"gave {result} drones to {args['target_swarm_id']}")
+            elif name == "set_swarm_encircle":
+                self.note_swarm(
+                    args["swarm_id"],
+                    f"encircling its target at radius {args['radius']}" if args["is_encircling"] else "not encircling",
+                )
+
+    def record(self, prompt, output, calls, environment):
+        """
+        Remember a handled command. calls are the (tool name, arguments, result) it made, output the agent's
+        reply (None if it was handled without the agent), environment the state it started from.
+        """
+        calls = [call for call in calls if call[0] not in READ_TOOLS]
+        self.track_swarms(calls, environment)
+        self.turns.append((prompt, reply_text(output, calls), calls))
+        self.compact()
+
+    def summary_text(self):
+        lines = []
+        if self.summary:
+            lines.append("Earlier commands in this session:")
+            lines += self.summary
+        if self.swarms:
+            lines.append("Swarms acted on in this session (most recent last):")
+            lines += [f"- {swarm_id}: {note}" for swarm_id, note in self.swarms.items()]
+        return "\n".join(lines)
+
+    def tokens(self):
+        return estimate_tokens(self.summary_text()) + sum(
+            estimate_tokens(prompt) + estimate_tokens(reply) for prompt, reply, _ in self.turns
+        )
+
+    def fold_oldest_turn(self):
+        prompt, _, calls = self.turns.popleft()
+        self.summary.append(summarize_turn(prompt, calls))
+
+    def compact(self):
+        # Fold older turns into the summary first, the latest turn is kept word for word as long as possible.
+        # Then forget the oldest commands, then the swarms acted on longest ago.
+        while self.tokens() > self.token_budget:
+            if len(self.turns) > 1:
+                self.fold_oldest_turn()
+            elif self.summary:
+                self.summary.popleft()
+            elif self.swarms:
+                self.swarms.popitem(last=False)
+            elif self.turns:
+                self.fold_oldest_turn()  # A single turn over the whole budget
+            else:
+                break
+
+    def messages(self, current_input):
+        # Agent input as a message list: the summary, the recent turns, then the new command
+        items = []
+        summary = self.summary_text()
+        if summary:
+            items.append({"role": "system", "content": summary})
+        for prompt, reply, _ in self.turns:
+            items.append({"role": "user", "content": prompt})
+            items.append({"role": "assistant", "content": reply})
+        items.append({"role": "user", "content": current_input})
+        return items
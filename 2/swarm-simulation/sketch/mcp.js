@@ -9,6 +9,8 @@ const functionRegistry = {
     set_swarm_encircle,
     fork_swarm_to_waypoints,
     assign_swarm_to_waypoints,
+    execute_commands,
+    subscribe_environment,
 };
 
 const argOrder = {
@@ -22,28 +24,107 @@ const argOrder = {
     assign_swarm_to_position: ["swarm_id", "x", "y"],
     assign_swarm_to_waypoints: ["swarm_id", "waypoints", "cycle"],
     set_swarm_encircle: ["swarm_id", "is_encircling", "radius"],
+    execute_commands: ["commands"],
+    subscribe_environment: ["rate"],
 };
 
+let socket = null; // Connection to the websocket bridge, set up by setupNetwork
+const useMsgPack = typeof MsgPack !== "undefined"; // msgpack.js is loaded, ask the bridge for binary frames
+
+function sendMessage(message) {
+    socket.send(useMsgPack ? MsgPack.encode(message) : JSON.stringify(message));
+}
+let environmentTimer = null; // Interval of the environment subscription, if any
+
+function call_command(command, args) {
+    // Convert args object to ordered array
+    let argsArr = [];
+    if (args && argOrder[command]) {
+        argsArr = argOrder[command].map(k => args[k]);
+    }
+    return functionRegistry[command](...argsArr);
+}
+
+// Replace arguments written as "$<n>" with the result of step n
+function resolve_step_references(args, results) {
+    let resolved = {};
+    for (let [key, value] of Object.entries(args)) {
+        let match = typeof value === "string" ? value.match(/^\$(\d+)$/) : null;
+        if (match) {
+            let step = parseInt(match[1]);
+            if (step >= results.length) {
+                throw new Error("Step " + step + " has not run yet");
+            }
+            value = results[step].result;
+        }
+        resolved[key] = value;
+    }
+    return resolved;
+}
+
+// Runs a list of commands in order within a single round trip, stopping at the first error.
+// Later commands can use the results of earlier ones, e.g. the id of a forked swarm, through "$<n>" arguments.
+function execute_commands(commands) {
+    let results = [];
+    for (let step of commands) {
+        if (!functionRegistry[step.command] || step.command === "execute_commands") {
+            results.push({ error: "Unknown command: " + step.command });
+            break;
+        }
+        try {
+            let args = resolve_step_references(step.args || {}, results);
+            results.push({ result: call_command(step.command, args) });
+        } catch (e) {
+            results.push({ error: String(e) });
+            break;
+        }
+    }
+    return results;
+}
+
+// Push an environment snapshot to the MCP server `rate` times per second (0 stops), so it can answer reads
+// without asking. Snapshots identical to the last one pushed are skipped.
+function subscribe_environment(rate) {
+    clearInterval(environmentTimer);
+    environmentTimer = null;
+    if (!(rate > 0)) return false;
+    let lastPushed = null;
+    environmentTimer = setInterval(() => {
+        if (!socket || socket.readyState !== WebSocket.OPEN) return;
+        const environment = get_environment();
+        const serialized = JSON.stringify(environment);
+        if (serialized === lastPushed) return;
+        lastPushed = serialized;
+        if (useMsgPack) socket.send(MsgPack.encode({ push: "environment", environment }));
+        else socket.send('{"push":"environment","environment":' + serialized + "}");
+    }, 1000 / rate);
+    return true;
+}
+
 function setupNetwork(functionRegistry) {
     const ws = new WebSocket("ws://localhost:8765");
+    ws.binaryType = "arraybuffer";
+    socket = ws;
     ws.onopen = () => {
-        ws.send(JSON.stringify({ role: "browser" }));
+        // The handshake is always JSON, so an older bridge still understands it
+        ws.send(JSON.stringify({ role: "browser", encodings: useMsgPack ? ["msgpack", "json"] : ["json"] }));
+    };
+    ws.onclose = () => {
+        subscribe_environment(0);
     };
     ws.onmessage = (event) => {
-        const msg = JSON.parse(event.data);
+        const msg = typeof event.data === "string" ? JSON.parse(event.data) : MsgPack.decode(event.data);
         let result;
+        const exec_start = performance.now();
         if (functionRegistry[msg.command]) {
-            console.log("Received command:", msg.command, "with args:", msg.args);
-            // Convert args object to ordered array
-            let argsArr = [];
-            if (msg.args && argOrder[msg.command]) {
-                argsArr = argOrder[msg.command].map(k => msg.args[k]);
-            }
-            result = functionRegistry[msg.command](...argsArr);
+            console.log("Received command:", msg.command, "with args:", msg.args, "for utterance:", msg.utterance_id);
+            result = call_command(msg.command, msg.args);
         } else {
             result = { error: "Unknown command: " + msg.command };
         }
-        ws.send(JSON.stringify({ result }));
+        // Echo the request id so the bridge can route the reply back to its caller,
+        // and report the execution time so the server can tell it apart from transport time
+        sendMessage({ id: msg.id, result, exec_ms: performance.now() - exec_start });
     };
 }
 
@@ -0,0 +1,236 @@
+// Minimal MessagePack codec (https://msgpack.org) for the bridge protocol, shared by mcp.js in the browser
+// and ws_server.js in node. Covers nil, booleans, numbers, strings, binary, arrays and maps; extension types
+// are not used by the protocol and are rejected.
+
+const MsgPack = (() => {
+    const textEncoder = new TextEncoder();
+    const textDecoder = new TextDecoder();
+
+    function encode(value) {
+        let buffer = new Uint8Array(1024);
+        let view = new DataView(buffer.buffer);
+        let length = 0;
+
+        function reserve(bytes) {
+            if (length + bytes <= buffer.length) return;
+            let grown = new Uint8Array(Math.max(buffer.length * 2, length + bytes));
+            grown.set(buffer.subarray(0, length));
+            buffer = grown;
+            view = new DataView(buffer.buffer);
+        }
+
+        function byte(b) {
+            reserve(1);
+            buffer[length++] = b;
+        }
+
+        function header(small, bits8, bits16, bits32, size, maxSmall) {
+            // Type byte plus the size in the smallest field that fits
+            if (small !== null && size <= maxSmall) {
+                byte(small | size);
+            } else if (bits8 !== null && size < 0x100) {
+                reserve(2);
+                buffer[length++] = bits8;
+                buffer[length++] = size;
+            } else if (size < 0x10000) {
+                reserve(3);
+                buffer[length] = bits16;
+                view.setUint16(length + 1, size);
+                length += 3;
+            } else {
+                reserve(5);
+                buffer[length] = bits32;
+                view.setUint32(length + 1, size);
+                length += 5;
+            }
+        }
+
+        function number(n) {
+            if (Number.isInteger(n) && n >= -0x80000000 && n <= 0xffffffff) {
+                if (n >= 0 && n < 0x80) return byte(n);
+                if (n < 0 && n >= -0x20) return byte(n & 0xff);
+                reserve(5);
+                if (n >= 0) {
+                    if (n < 0x100) {
+                        buffer[length++] = 0xcc;
+                        buffer[length++] = n;
+                    } else if (n < 0x10000) {
+                        buffer[length] = 0xcd;
+                        view.setUint16(length + 1, n);
+                        length += 3;
+                    } else {
+                        buffer[length] = 0xce;
+                        view.setUint32(length + 1, n);
+                        length += 5;
+                    }
+                } else if (n >= -0x80) {
+                    buffer[length++] = 0xd0;
+                    view.setInt8(length++, n);
+                } else if (n >= -0x8000) {
+                    buffer[length] = 0xd1;
+                    view.setInt16(length + 1, n);
+                    length += 3;
+                } else {
+                    buffer[length] = 0xd2;
+                    view.setInt32(length + 1, n);
+                    length += 5;
+                }
+                return;
+            }
+            reserve(9);
+            buffer[length] = 0xcb;
+            view.setFloat64(length + 1, n);
+            length += 9;
+        }
+
+        function write(value) {
+            if (value === null || value === undefined) {
+                byte(0xc0);
+            } else if (value === false) {
+                byte(0xc2);
+            } else if (value === true) {
+                byte(0xc3);
+            } else if (typeof value === "number") {
+                number(value);
+            } else if (typeof value === "string") {
+                const bytes = textEncoder.encode(value);
+                header(0xa0, 0xd9, 0xda, 0xdb, bytes.length, 31);
+                reserve(bytes.length);
+                buffer.set(bytes, length);
+                length += bytes.length;
+            } else if (value instanceof Uint8Array) {
+                header(null, 0xc4, 0xc5, 0xc6, value.length, 0);
+                reserve(value.length);
+                buffer.set(value, length);
+                length += value.length;
+            } else if (Array.isArray(value)) {
+                header(0x90, null, 0xdc, 0xdd, value.length, 15);
+                for (const item of value) write(item);
+            } else if (typeof value === "object") {
+                // Like JSON.stringify, keys with undefined values are left out
+                const entries = Object.entries(value).filter(([, v]) => v !== undefined);
+                header(0x80, null, 0xde, 0xdf, entries.length, 15);
+                for (const [key, item] of entries) {
+                    write(key);
+                    write(item);
+                }
+            } else {
+                throw new TypeError("Cannot encode " + typeof value);
+            }
+        }
+
+        write(value);
+        return buffer.slice(0, length);
+    }
+
+    function decode(data, leadingFields = false) {
+        // Accepts an ArrayBuffer (browser) or any Uint8Array, including node Buffers
+        const bytes = data instanceof ArrayBuffer ? new Uint8Array(data) : data;
+        const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+        let offset = 0;
+
+        function string(size) {
+            const value = textDecoder.decode(bytes.subarray(offset, offset + size));
+            offset += size;
+            return value;
+        }
+
+        function binary(size) {
+            const value = new Uint8Array(bytes.subarray(offset, offset + size)); // A plain copy, also for node Buffers
+            offset += size;
+            return value;
+        }
+
+        function array(size) {
+            const value = new Array(size);
+            for (let i = 0; i < size; i++) value[i] = read();
+            return value;
+        }
+
+        function map(size) {
+            const value = {};
+            for (let i = 0; i < size; i++) {
+                const key = read();
+                value[key] = read();
+            }
+            return value;
+        }
+
+        function read() {
+            const type = bytes[offset++];
+            if (type === undefined) throw new RangeError("Truncated MessagePack data");
+            if (type < 0x80) return type;
+            if (type < 0x90) return map(type & 0x0f);
+            if (type < 0xa0) return array(type & 0x0f);
+            if (type < 0xc0) return string(type & 0x1f);
+            if (type >= 0xe0) return type - 0x100;
+            let value;
+            switch (type) {
+                case 0xc0: return null;
+                case 0xc2: return false;
+                case 0xc3: return true;
+                case 0xc4: return binary(bytes[offset++]);
+                case 0xc5: value = view.getUint16(offset); offset += 2; return binary(value);
+                case 0xc6: value = view.getUint32(offset); offset += 4; return binary(value);
+                case 0xca: value = view.getFloat32(offset); offset += 4; return value;
+                case 0xcb: value = view.getFloat64(offset); offset += 8; return value;
+                case 0xcc: return bytes[offset++];
+                case 0xcd: value = view.getUint16(offset); offset += 2; return value;
+                case 0xce: value = view.getUint32(offset); offset += 4; return value;
+                case 0xcf: value = Number(view.getBigUint64(offset)); offset += 8; return value;
+                case 0xd0: value = view.getInt8(offset); offset += 1; return value;
+                case 0xd1: value = view.getInt16(offset); offset += 2; return value;
+                case 0xd2: value = view.getInt32(offset); offset += 4; return value;
+                case 0xd3: value = Number(view.getBigInt64(offset)); offset += 8; return value;
+                case 0xd9: return string(bytes[offset++]);
+                case 0xda: value = view.getUint16(offset); offset += 2; return string(value);
+                case 0xdb: value = view.getUint32(offset); offset += 4; return string(value);
+                case 0xdc: value = view.getUint16(offset); offset += 2; return array(value);
+                case 0xdd: value = view.getUint32(offset); offset += 4; return array(value);
+                case 0xde: value = view.getUint16(offset); offset += 2; return map(value);
+                case 0xdf: value = view.getUint32(offset); offset += 4; return map(value);
+                default: throw new TypeError("Unsupported MessagePack type 0x" + type.toString(16));
+            }
+        }
+
+        function isContainer(type) {
+            // Arrays, maps and binary, the types that can be large
+            return (type >= 0x80 && type < 0xa0) || (type >= 0xc4 && type <= 0xc6) || (type >= 0xdc && type <= 0xdf);
+        }
+
+        function leading() {
+            // The fields at the start of a map up to the first container, the rest is never read
+            const type = bytes[offset++];
+            let size;
+            if (type >= 0x80 && type < 0x90) size = type & 0x0f;
+            else if (type === 0xde) { size = view.getUint16(offset); offset += 2; }
+            else if (type === 0xdf) { size = view.getUint32(offset); offset += 4; }
+            else return {};
+            const fields = {};
+            try {
+                for (let i = 0; i < size; i++) {
+                    if (isContainer(bytes[offset])) break;
+                    const key = read();
+                    if (isContainer(bytes[offset])) break;
+                    fields[key] = read();
+                }
+            } catch {
+                // A field that can't be read ends the peek, decoding the whole message reports the error
+            }
+            return fields;
+        }
+
+        return leadingFields ? leading() : read();
+    }
+
+    // The scalar fields a map starts with, e.g. the id and command of a request, without decoding the rest of it
+    function peek(data) {
+        return decode(data, true);
+    }
+
+    return { encode, decode, peek };
+})();
+
+if (typeof module !== "undefined") {
+    module.exports = MsgPack;
+}
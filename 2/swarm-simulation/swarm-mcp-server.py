@@ -1,35 +1,354 @@
 # python_mcp_server.py
+import argparse
 import asyncio
-import websockets
+import itertools
+import os
+import sys
+import time
 import json
 from mcp.server.fastmcp import FastMCP
+from tracing import current_utterance, tracer
 
-mcp = FastMCP("Swarm Simulation MCP")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from browser_bridge import BrowserConnection, CircuitBreaker, ReadCache, request_with_deadline  # noqa: E402
+
+
+class TracedFastMCP(FastMCP):
+    """
+    FastMCP that times every tool call. The voice agent sends the ID of the utterance a call belongs to
+    in the request's _meta, it is made the current utterance so send_to_browser passes it on to the browser.
+    """
+
+    async def call_tool(self, name, arguments):
+        try:
+            meta = self.get_context().request_context.meta
+        except ValueError:
+            meta = None  # Called outside of an MCP request
+        utterance_id = getattr(meta, "utterance_id", None) if meta is not None else None
+        current_utterance.set(utterance_id)
+        with tracer.span("mcp_tool", utterance_id, tool=name):
+            return await super().call_tool(name, arguments)
+
+
+mcp = TracedFastMCP("Swarm Simulation MCP")
 
 WS_URI = "ws://localhost:8765"
+RECONNECT_DELAY = 1.0  # Seconds to wait before reconnecting to the bridge
+ENVIRONMENT_MAX_AGE = 0.5  # Seconds a cached environment is served without asking the browser
+MAX_IN_FLIGHT = 16  # Requests sent to the browser before waiting for replies
+PUSH_MAX_AGE = 2.0  # Seconds a pushed environment is served while the browser is not pushing (e.g. stalled)
+REMOVED_HISTORY = 10000  # Removed entities remembered for deltas, callers further behind get a full copy
+
+# Seconds a browser command may take (including waiting for the bridge connection) before the tool call fails
+DEFAULT_DEADLINE = 10.0
+COMMAND_DEADLINES = {"get_environment": 5.0, "execute_commands": 20.0}
+READ_COMMANDS = {"get_environment"}  # Safe to send again after a failure
+READ_RETRIES = 2
+RETRY_BACKOFF = 0.2  # Seconds before the first retry, doubled (plus jitter) for each further one
+BREAKER_FAILURES = 3  # Consecutive failures after which calls fail fast...
+BREAKER_COOLDOWN = 5.0  # ...for this many seconds, then one trial call is let through
+
+
+class TracedBrowserConnection(BrowserConnection):
+    """
+    BrowserConnection that passes the current utterance on to the browser and times every round trip,
+    using MessagePack when the msgpack package is installed.
+    """
+
+    def __init__(self, uri):
+        super().__init__(uri, use_msgpack=True, max_in_flight=MAX_IN_FLIGHT, reconnect_delay=RECONNECT_DELAY)
+
+    def request_fields(self):
+        return {"utterance_id": current_utterance.get()}
+
+    def round_trip(self, cmd):
+        return tracer.span("bridge_round_trip", command=cmd)
+
+    def on_reply(self, cmd, reply):
+        # mcp.js reports how long the command itself took, the rest of the round trip is transport
+        if "exec_ms" in reply:
+            tracer.record("browser_execution", reply["exec_ms"] / 1000, command=cmd)
+
+
+class HeadlessSimulation:
+    """
+    Runs the NumPy swarm engine in-process in place of the browser.
+    The expensive part of a tick runs in a worker thread on what the engine looked like when it started
+    (see SwarmEngine.step), so commands never wait for a tick: they are applied right away on the event loop,
+    and the tick's result is stored back between them.
+    """
+
+    def __init__(self, engine, tick_rate):
+        self.engine = engine
+        self.tick_interval = 1.0 / tick_rate
+        self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        while True:
+            tick_start = time.perf_counter()
+            result = await asyncio.to_thread(self.engine.compute_step, self.engine.begin_step())
+            self.engine.end_step(result)
+            elapsed = time.perf_counter() - tick_start
+            await asyncio.sleep(max(0.0, self.tick_interval - elapsed))
+
+    async def request(self, cmd, args=None):
+        self.start()
+        with tracer.span("browser_execution", command=cmd):
+            return self.engine.execute(cmd, args)
+
+
+# Where commands are sent, the browser by default or a HeadlessSimulation with --headless
+backend = TracedBrowserConnection(WS_URI)
+
+
+class EnvironmentCache(ReadCache):
+    """
+    Versioned copy of the environment.
+    Every refresh is diffed against the previous copy, and each entity remembers the version it last
+    changed in, so callers can ask for only the entities that changed since a version they already have.
+    Refreshes go through ReadCache, so concurrent ones share a single get_environment request, and a copy
+    fetched while a command was changing the environment is never treated as fresh.
+    When the browser pushes snapshots, reads are answered from the latest one until a command invalidates it,
+    the first read after a command still asks the browser (faster than waiting for the next push).
+    """
+
+    def __init__(self):
+        super().__init__(ENVIRONMENT_MAX_AGE)
+        # Versions start from the time the server started (in ms), so a version handed out before a restart
+        # is never taken for one of this run. history_start: deltas since an older version would miss removals.
+        self.version = self.history_start = int(time.time() * 1000)
+        self.categories = []  # e.g. "swarms", "cars", in the order the browser lists them
+        self.entities = {}  # (category, id) -> description
+        self.changed_in = {}  # (category, id) -> version the entity last changed in
+        self.removed_in = {}  # (category, id) -> version the entity was removed in
+        self.fetch_ids = itertools.count()
+        self.applied_fetch = -1  # Replies come back in order, but never let an older fetch overwrite a newer one
+        self.pushed_at = None  # When the current copy was pushed, None after an invalidation
+
+    def invalidate(self):
+        super().invalidate()
+        self.pushed_at = None
+
+    def is_fresh(self):
+        if self.pushed_at is not None and time.monotonic() - self.pushed_at < PUSH_MAX_AGE:
+            return True  # Also covers the browser stalling for a moment
+        age = self.age("get_environment")
+        return age is not None and age < self.max_age
+
+    def apply_push(self, environment):
+        # Pushes arrive on the same socket as replies, so one that arrives after a command's reply includes its effects
+        self.applied_fetch = next(self.fetch_ids)
+        self.update(environment)
+        self.pushed_at = time.monotonic()
+
+    async def refresh(self):
+        # Joins the request in flight unless a command has invalidated the cache since it was sent
+        await self.get("get_environment", self.fetch)
+
+    async def fetch(self):
+        fetch_id = next(self.fetch_ids)
+        environment = await send_to_browser("get_environment")
+        if fetch_id > self.applied_fetch:
+            self.applied_fetch = fetch_id
+            self.update(environment)
+        return environment
+
+    def update(self, environment):
+        entities = {}
+        for category, descriptions in environment.items():
+            for description in descriptions:
+                entities[(category, description["id"])] = description
+
+        changed = [key for key, desc in entities.items() if self.entities.get(key) != desc]
+        removed = [key for key in self.entities if key not in entities]
+        if changed or removed:
+            self.version += 1
+            for key in changed:
+                self.changed_in[key] = self.version
+                self.removed_in.pop(key, None)
+            for key in removed:
+                self.removed_in[key] = self.version
+                del self.changed_in[key]
+            # Removals are recorded in version order, forget the oldest
+            while len(self.removed_in) > REMOVED_HISTORY:
+                oldest = next(iter(self.removed_in))
+                self.history_start = self.removed_in.pop(oldest)
+
+        self.categories = list(environment)
+        self.entities = entities
+
+    def environment(self):
+        environment = {category: [] for category in self.categories}
+        for (category, _), description in self.entities.items():
+            environment[category].append(description)
+        return environment
+
+    def delta(self, since_version):
+        removed = {category: [] for category in self.categories}
+        if not self.history_start <= since_version <= self.version:
+            # Not a version of this run of the server, or too old to know everything removed since:
+            # the caller has to replace what it has with this full copy
+            return {"version": self.version, "reset": True, "changed": self.environment(), "removed": removed}
+        changed = {category: [] for category in self.categories}
+        for key, description in self.entities.items():
+            if self.changed_in[key] > since_version:
+                changed[key[0]].append(description)
+        for (category, id), version in self.removed_in.items():
+            if version > since_version:
+                removed[category].append(id)
+        return {"version": self.version, "reset": False, "changed": changed, "removed": removed}
+
+
+environment_cache = EnvironmentCache()
+
+
+breaker = CircuitBreaker(BREAKER_FAILURES, BREAKER_COOLDOWN)
 
 
 async def send_to_browser(cmd, args=None):
-    async with websockets.connect(WS_URI) as ws:
-        # Register as python client
-        await ws.send(json.dumps({"role": "python"}))
-        await ws.send(json.dumps({"command": cmd, "args": args}))
-        reply = await ws.recv()
-        return json.loads(reply)["result"]
+    try:
+        return await request_with_deadline(
+            backend,
+            breaker,
+            cmd,
+            args,
+            deadline=COMMAND_DEADLINES.get(cmd, DEFAULT_DEADLINE),
+            retries=READ_RETRIES if cmd in READ_COMMANDS else 0,
+            retry_backoff=RETRY_BACKOFF,
+        )
+    finally:
+        # Anything but a read may have changed the environment, even if it failed part way
+        if cmd != "get_environment":
+            environment_cache.invalidate()
+
+
+async def cached_environment():
+    # Only go to the browser when the cached copy is too old or a command may have changed it
+    if not environment_cache.is_fresh():
+        await environment_cache.refresh()
+    return environment_cache
+
+
+# Fields kept by get_environment(detail="summary"), besides "type" and "id"
+SUMMARY_FIELDS = {
+    "swarms": ["center_of_mass", "num_drones"],
+    "cars": ["position"],
+    "landmarks": ["position"],
+    "no-fly zones": ["lower_left_corner", "upper_right_corner"],
+}
+
+
+def in_bbox(description, x_min, y_min, x_max, y_max):
+    if "lower_left_corner" in description:
+        # No-fly zones count when they overlap the box
+        lower_left, upper_right = description["lower_left_corner"], description["upper_right_corner"]
+        return (
+            min(lower_left["x"], upper_right["x"]) <= x_max
+            and max(lower_left["x"], upper_right["x"]) >= x_min
+            and min(lower_left["y"], upper_right["y"]) <= y_max
+            and max(lower_left["y"], upper_right["y"]) >= y_min
+        )
+    position = description.get("center_of_mass") or description.get("position")
+    return position is not None and x_min <= position["x"] <= x_max and y_min <= position["y"] <= y_max
+
+
+def select_environment(environment, entity_types, fields, bbox, limit, offset, detail):
+    # Filter, project and page the environment so only what was asked for goes into the agent's prompt
+    if detail not in ("full", "summary"):
+        raise ValueError(f"Unknown detail level: {detail}, use 'full' or 'summary'")
+    if entity_types is not None:
+        unknown = [entity_type for entity_type in entity_types if entity_type not in environment]
+        if unknown:
+            raise ValueError(f"Unknown entity types: {unknown}, available: {list(environment)}")
+    if bbox is not None and len(bbox) != 4:
+        raise ValueError("bbox must be [x_min, y_min, x_max, y_max]")
+    # A negative slice bound would count from the end and silently return the wrong page
+    if limit is not None and limit < 0:
+        raise ValueError(f"limit must be 0 or more, got {limit}")
+    if offset < 0:
+        raise ValueError(f"offset must be 0 or more, got {offset}")
+
+    selected = {}
+    counts = {}
+    for category, descriptions in environment.items():
+        if entity_types is not None and category not in entity_types:
+            continue
+        if bbox is not None:
+            descriptions = [description for description in descriptions if in_bbox(description, *bbox)]
+        counts[category] = len(descriptions)
+        descriptions = descriptions[offset : None if limit is None else offset + limit]
+
+        keep = fields if fields is not None else SUMMARY_FIELDS.get(category) if detail == "summary" else None
+        if keep is not None:
+            keep = {"type", "id", *keep}
+            descriptions = [
+                {key: value for key, value in description.items() if key in keep}
+                for description in descriptions
+            ]
+        selected[category] = descriptions
+
+    if limit is not None or offset:
+        selected["counts"] = counts  # Totals before paging, to tell whether there is more
+    return selected
 
 
 @mcp.tool()
-async def get_environment() -> dict:
+async def get_environment(
+    entity_types: list[str] | None = None,
+    fields: list[str] | None = None,
+    bbox: list[float] | None = None,
+    limit: int | None = None,
+    offset: int = 0,
+    detail: str = "full",
+) -> dict:
     """
     Get the current environment state, including all swarms and entities.
+    Args:
+        entity_types (list[str], optional): Only include these entity types: 'swarms', 'cars', 'landmarks', 'no-fly zones'. Default: all.
+        fields (list[str], optional): Only include these fields of each entity (e.g. ['center_of_mass', 'num_drones']), 'type' and 'id' are always included. Default: all fields.
+        bbox (list[float], optional): [x_min, y_min, x_max, y_max], only include entities located inside this box (no-fly zones: overlapping it).
+        limit (int, optional): At most this many entities per entity type.
+        offset (int, optional): Skip this many entities per entity type first, for paging through with limit. Default 0.
+        detail (str, optional): 'full' (default) or 'summary', which only gives each entity's ID, position and (for swarms) drone count.
     Returns:
-        dict: The current environment state with swarms and entities.
+        dict: The current environment state with swarms and entities, plus the 'version' of this state.
+            With limit or offset, 'counts' gives the number of matching entities per type before paging.
     Usage:
-        Use this tool to retrieve the full state of the simulation environment, including all active swarms and entities.
+        Use this tool to retrieve the state of the simulation environment. Call it without arguments for the full state, or ask only for what you need (e.g. detail='summary', or entity_types=['swarms']) to keep the result small in large scenarios.
     Effect:
         Returns a dictionary containing the current state of the environment, which can be used for further processing or analysis.
     """
-    return await send_to_browser("get_environment")
+    cache = await cached_environment()
+    environment = select_environment(
+        cache.environment(), entity_types, fields, bbox, limit, offset, detail
+    )
+    return {"version": cache.version, **environment}
+
+
+@mcp.tool()
+async def get_environment_delta(since_version: int) -> dict:
+    """
+    Get only the swarms and entities that changed since a previously seen environment version.
+    Args:
+        since_version (int): The 'version' returned by an earlier get_environment or get_environment_delta call. Use 0 to get everything.
+    Returns:
+        dict: A dictionary with keys:
+            - version (int): The current environment version, pass it as since_version next time.
+            - reset (bool): True if since_version is unknown (e.g. from before the server restarted) or too old,
+              then 'changed' holds the whole environment and everything known from earlier calls should be dropped.
+            - changed (dict): For each entity type, the full descriptions of entities that were added or changed.
+            - removed (dict): For each entity type, the IDs of entities that no longer exist.
+    Usage:
+        Use this tool instead of get_environment when you already know an earlier state of the environment and only need to refresh it.
+    Effect:
+        Returns the changes to the environment, entities that did not change are left out.
+    """
+    cache = await cached_environment()
+    return cache.delta(since_version)
 
 
 @mcp.tool()
@@ -163,7 +482,7 @@ async def fork_swarm_to_waypoints(
 
 
 @mcp.tool()
-async def assign_swarm_to_follow(swarm_id: str, target_id: str) -> str:
+async def assign_swarm_to_follow(swarm_id: str, target_id: str) -> bool:
     """
     Change the target of a swarm to follow a new entity (car, swarm, or marker).
     Args:
@@ -182,7 +501,7 @@ async def assign_swarm_to_follow(swarm_id: str, target_id: str) -> str:
 
 
 @mcp.tool()
-async def assign_swarm_to_position(swarm_id: str, x: float, y: float) -> dict:
+async def assign_swarm_to_position(swarm_id: str, x: float, y: float) -> bool:
     """
     Change the target of a swarm to a new fixed position in the environment.
     Args:
@@ -204,7 +523,7 @@ async def assign_swarm_to_position(swarm_id: str, x: float, y: float) -> dict:
 @mcp.tool()
 async def assign_swarm_to_waypoints(
     swarm_id: str, waypoints: list, cycle: bool
-) -> dict:
+) -> bool:
     """
     Change the target of a swarm to a new fixed position in the environment.
     Args:
@@ -252,5 +571,91 @@ async def set_swarm_encircle(swarm_id: str, is_encircling: bool, radius: float)
     )
 
 
+@mcp.tool()
+async def execute_commands(commands: list) -> list:
+    """
+    Run several commands in order, all in a single step.
+    Args:
+        commands (list): A list of dicts, one per step, each with keys:
+            - command (str): The name of the tool to run, e.g. 'fork_swarm_to_position' or 'assign_swarm_to_follow'.
+            - args (dict): The arguments for that tool, with the same names as the tool's parameters.
+            Any argument written as "$<n>" is replaced by the result of step n (counting from 0),
+            e.g. {"swarm_id": "$0"} uses the ID of the swarm created by a fork in the first step.
+    Returns:
+        list: One dict per step that ran, with key 'result' holding the tool's return value, or key 'error' if the step failed.
+            Execution stops at the first failed step.
+    Usage:
+        Use this tool to carry out a multi-step plan, e.g. splitting a swarm into several groups and sending each to a different target, without waiting for each step separately.
+    Effect:
+        The commands are applied to the environment in the given order, exactly as if each tool had been called on its own.
+    """
+    return await send_to_browser("execute_commands", {"commands": commands})
+
+
+async def main():
+    global backend
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="Simulate the swarms in-process with NumPy instead of using the browser sketch",
+    )
+    parser.add_argument(
+        "--num-drones",
+        type=int,
+        default=1000,
+        help="Number of drones (headless only), grow --world-size along with it to keep the density the same",
+    )
+    parser.add_argument(
+        "--world-size",
+        type=float,
+        default=600,
+        help="Width and height of the simulated world (headless only)",
+    )
+    parser.add_argument(
+        "--tick-rate",
+        type=float,
+        default=60,
+        help="Simulation ticks per second (headless only)",
+    )
+    parser.add_argument(
+        "--push-rate",
+        type=float,
+        default=10,
+        help="Environment snapshots per second the browser pushes to the server, 0 to only ask when needed",
+    )
+    parser.add_argument(
+        "--trace-file", help="Append a JSON line per timed stage to this file"
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="Serve stage latency histograms at http://localhost:<port>/metrics",
+    )
+    args = parser.parse_args()
+    tracer.configure("swarm-mcp-server", args.trace_file, args.metrics_port)
+
+    if args.headless:
+        from swarm_engine import SwarmEngine
+
+        engine = SwarmEngine(
+            num_drones=args.num_drones, width=args.world_size, height=args.world_size
+        )
+        backend = HeadlessSimulation(engine, args.tick_rate)
+        print(f"[INFO] Running headless simulation with {args.num_drones} drones.")
+    elif args.push_rate > 0:
+        # The engine runs in-process, so pushes are only worth it for the browser
+        backend.subscribe(
+            "subscribe_environment",
+            {"rate": args.push_rate},
+            "environment",
+            lambda message: environment_cache.apply_push(message["environment"]),
+        )
+
+    # Start the backend up front instead of on the first tool call
+    backend.start()
+    await mcp.run_sse_async()
+
+
 if __name__ == "__main__":
-    mcp.run(transport="sse")
+    asyncio.run(main())
@@ -0,0 +1,603 @@
+# Headless swarm simulation, a pure-Python port of the p5js sketch.
+# Drone state lives in structure-of-arrays NumPy buffers and the boids forces are computed
+# for all drones at once, so the MCP server can run large swarms without a browser.
+import re
+
+import numpy as np
+
+PHONETIC_NAMES = ["Alpha", "Bravo", "Charlie", "Delta", "Echo", "Foxtrot", "Golf", "Hotel", "India", "Juliet", "Kilo", "Lima", "Mike", "November", "Oscar", "Papa", "Quebec", "Romeo", "Sierra", "Tango", "Uniform", "Victor", "Whiskey", "Xray", "Yankee", "Zulu"]
+
+DRONE_SPECIALIZATIONS = ["Kamikaze", "Interceptor", "Jammer", "Reconnaissance", "Decoy"]
+
+# Same constants as drone.js
+BOIDS_DISTANCE = 20.0
+DRONE_SIZE = 2.0
+DRONE_SPEED = 1.0
+SEPARATION_WEIGHT = 1.0
+ALIGNMENT_WEIGHT = -0.1
+SEEK_WEIGHT = 3.0
+NO_FLY_WEIGHT = 3.0
+
+# Neighbor grid: drones within boids distance of each other are at most CELL_REACH cells apart
+CELL_REACH = 2
+CELL_SIZE = BOIDS_DISTANCE / CELL_REACH
+MAX_GRID_CELLS_PER_DRONE = 16  # Sparser grids are binary searched instead of tabulated
+MAX_PAIRS_PER_CHUNK = 4_000_000  # Bounds the memory used by the neighbor pass
+
+STEP_REFERENCE = re.compile(r"^\$(\d+)$")  # "$<n>" refers to the result of step n in execute_commands
+
+
+def describe_position(position):
+    return {"x": int(round(position[0])), "y": int(round(position[1]))}
+
+
+def set_magnitude(vectors, magnitudes):
+    # Vectorized p5.Vector.setMag, zero vectors stay zero
+    lengths = np.linalg.norm(vectors, axis=1, keepdims=True)
+    scale = np.divide(magnitudes.reshape(-1, 1), lengths, out=np.zeros_like(lengths), where=lengths > 0)
+    return vectors * scale
+
+
+def limit_magnitude(vectors, limit):
+    # Vectorized p5.Vector.limit
+    lengths = np.linalg.norm(vectors, axis=1, keepdims=True)
+    scale = np.divide(limit, lengths, out=np.ones_like(lengths), where=lengths > limit)
+    return vectors * scale
+
+
+def as_complex(vectors):
+    # An (n, 2) float32 array viewed as n complex64 numbers x + iy, without copying
+    return np.ascontiguousarray(vectors, dtype=np.float32).view(np.complex64)[:, 0]
+
+
+def as_vectors(numbers):
+    # Back from complex numbers to an (n, 2) float32 array
+    return np.ascontiguousarray(numbers, dtype=np.complex64).view(np.float32).reshape(-1, 2)
+
+
+def neighbor_forces(positions, velocities):
+    """
+    Separation and alignment from every drone within boids distance, as (n, 2) arrays.
+    Drones are sorted by the cell of a uniform grid they are in (column-major), so the cells around a drone
+    are one contiguous range of the sorted drones per grid column. Every pair is visited once, from the drone
+    sorted first (its own cell and the cells after it), and adds its forces to both drones.
+    """
+    n = len(positions)
+    cells = np.floor(positions * (1 / CELL_SIZE)).astype(np.int64)
+    cells -= cells.min(axis=0) - CELL_REACH
+    num_rows = int(cells[:, 1].max()) + CELL_REACH + 1
+    keys = cells[:, 0] * num_rows + cells[:, 1]
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+    z = as_complex(positions[order])
+    v = as_complex(velocities[order])
+
+    # Sorted index of the first drone in a cell (or after it, for an empty one)
+    num_cells = (int(cells[:, 0].max()) + CELL_REACH + 1) * num_rows
+    if num_cells <= MAX_GRID_CELLS_PER_DRONE * n:
+        cell_starts = np.zeros(num_cells + 1, dtype=np.intp)
+        np.cumsum(np.bincount(sorted_keys, minlength=num_cells), out=cell_starts[1:])
+        first_in = cell_starts.__getitem__
+    else:
+        first_in = sorted_keys.searchsorted
+
+    # Candidate ranges per drone: the drones after it in its own column up to CELL_REACH rows down,
+    # and the next CELL_REACH columns up to CELL_REACH rows either way
+    range_starts = np.empty((n, CELL_REACH + 1), dtype=np.intp)
+    range_ends = np.empty((n, CELL_REACH + 1), dtype=np.intp)
+    range_starts[:, 0] = np.arange(1, n + 1)
+    range_ends[:, 0] = first_in(sorted_keys + CELL_REACH + 1)
+    for column in range(1, CELL_REACH + 1):
+        column_keys = sorted_keys + column * num_rows
+        range_starts[:, column] = first_in(column_keys - CELL_REACH)
+        range_ends[:, column] = first_in(column_keys + CELL_REACH + 1)
+    range_lengths = range_ends - range_starts
+
+    # Single precision sums, np.add.at is only fast when they match the pushes
+    separation = np.zeros(n, dtype=np.complex64)
+    alignment = np.zeros(n, dtype=np.complex64)
+    counts = np.zeros(n, dtype=np.intp)
+
+    # Split the drones into contiguous chunks whose candidate pairs fit in MAX_PAIRS_PER_CHUNK
+    candidates = range_lengths.sum(axis=1)
+    chunk_ids = np.cumsum(candidates) // MAX_PAIRS_PER_CHUNK
+    boundaries = np.concatenate(([0], np.flatnonzero(np.diff(chunk_ids)) + 1, [n]))
+    for first, last in zip(boundaries[:-1], boundaries[1:]):
+        lengths = range_lengths[first:last].ravel()
+        total = int(lengths.sum())
+        if total == 0:
+            continue
+        # Sorted index of every candidate, range by range, with the drone it is a candidate of
+        j = np.repeat(range_starts[first:last].ravel() - (np.cumsum(lengths) - lengths), lengths)
+        j += np.arange(total)
+        diff = np.repeat(z[first:last], candidates[first:last])
+        diff -= z[j]
+        dist_from_centers = np.abs(diff)
+        close = np.flatnonzero(dist_from_centers < BOIDS_DISTANCE)
+        if len(close) == 0:
+            continue
+        i = np.repeat(np.arange(first, last), candidates[first:last])[close]
+        j, diff, dist_from_centers = j[close], diff[close], dist_from_centers[close]
+
+        dist_from_edges = dist_from_centers - 2 * DRONE_SIZE
+        touching = dist_from_edges <= 0
+        safe_edges = np.where(touching, np.float32(1), dist_from_edges)
+        magnitude = np.where(
+            touching,
+            np.float32(9999999.0),  # Strong repulsion if too close
+            (dist_from_edges - dist_from_centers + BOIDS_DISTANCE) / safe_edges - 1,
+        )
+        # setMag, coincident drones get no push
+        scale = np.divide(magnitude, dist_from_centers, out=np.zeros_like(magnitude), where=dist_from_centers > 0)
+        push = diff * scale  # On i, the opposite push on j
+
+        # Pairs come grouped by i, so its sums are segment sums. The j side is scattered.
+        segments = np.flatnonzero(np.diff(i, prepend=-1))
+        owners = i[segments]
+        separation[owners] += np.add.reduceat(push, segments)
+        alignment[owners] += np.add.reduceat(v[j], segments)
+        counts[owners] += np.diff(segments, append=len(i))
+        np.add.at(separation, j, -push)
+        np.add.at(alignment, j, v[i])
+        counts += np.bincount(j, minlength=n)
+
+    has_neighbors = counts > 0
+    separation[has_neighbors] /= counts[has_neighbors]
+    alignment[has_neighbors] /= counts[has_neighbors]
+    # setMag to the drone speed, subtract the velocity, limit to 0.1
+    lengths = np.abs(alignment)
+    alignment = np.divide(alignment * DRONE_SPEED, lengths, out=np.zeros_like(alignment), where=lengths > 0) - v
+    lengths = np.abs(alignment)
+    alignment = np.where(lengths > 0.1, alignment * (0.1 / np.maximum(lengths, 0.1)), alignment)
+    alignment[~has_neighbors] = 0
+
+    # Back from grid order to drone order
+    unsorted_separation = np.empty(n, dtype=np.complex64)
+    unsorted_alignment = np.empty(n, dtype=np.complex64)
+    unsorted_separation[order] = separation
+    unsorted_alignment[order] = alignment
+    return as_vectors(unsorted_separation), as_vectors(unsorted_alignment)
+
+
+def seek_forces(positions, slots, target_positions, is_encircling, radii):
+    # Seek the swarm target with strength decreasing as the drone gets closer
+    slots = np.maximum(slots, 0)
+    seek = as_complex(target_positions)[slots] - as_complex(positions)
+    d = np.abs(seek)
+    radius = radii[slots]
+    encircle_strength = np.where(
+        d < radius,
+        -np.clip((radius - d) / 10, 0, 1),
+        np.clip((d - radius) / 100, 0, 1),
+    )
+    strength = np.where(is_encircling[slots], encircle_strength, np.clip(d / 200, 0, 1)) * 0.5
+    # setMag to the drone speed, scaled by the strength
+    scale = np.divide(strength * DRONE_SPEED, d, out=np.zeros_like(d), where=d > 0)
+    return as_vectors(seek * scale)
+
+
+def no_fly_forces(positions, no_fly_zones):
+    avoid = np.zeros_like(positions)
+    for no_fly_zone in no_fly_zones:
+        # nearest point on the rect
+        lower_left = no_fly_zone.lower_left_corner.astype(np.float32)
+        upper_right = no_fly_zone.upper_right_corner.astype(np.float32)
+        diff = positions - np.clip(positions, lower_left, upper_right)
+        d = np.hypot(diff[:, 0], diff[:, 1])
+        inside = d == 0
+
+        # if we are inside the no-fly zone, push from center
+        if inside.any():
+            center = (lower_left + upper_right) / 2
+            avoid[inside] += set_magnitude(positions[inside] - center, np.full(inside.sum(), 999.0))
+
+        # if we're inside the influence radius, push back
+        near = np.flatnonzero(~inside & (d < BOIDS_DISTANCE + DRONE_SIZE))
+        avoid[near] += set_magnitude(diff[near], BOIDS_DISTANCE / d[near] - 1)
+    return avoid
+
+
+class TargetMarker:
+    def __init__(self, position):
+        self.position = np.asarray(position, dtype=float)
+
+    def describe(self, depth):
+        return {"type": "coordinate", "position": describe_position(self.position)}
+
+
+class WayPoints:
+    def __init__(self, waypoints, cycle):
+        self.waypoints = waypoints
+        self.cycle = cycle
+
+    @property
+    def position(self):
+        return self.waypoints[0].position
+
+    def shift(self):
+        first_waypoint = self.waypoints.pop(0)
+        if self.cycle:
+            self.waypoints.append(first_waypoint)
+
+    def describe(self, depth):
+        return {
+            "type": "waypoints",
+            "waypoints": [waypoint.describe(depth + 1) for waypoint in self.waypoints],
+        }
+
+
+class Swarm:
+    def __init__(self, id, slot, target):
+        self.id = id
+        self.slot = slot  # Index of this swarm in the engine's per-swarm arrays, drones refer to it
+        self.target = target
+        self.position = target.position.copy()
+        self.is_encircling = False
+        self.radius = 50
+        self.num_drones = 0
+        self.num_drone_specializations = {}
+
+    def describe(self, depth):
+        # only describe the full details of the swarm if this is the main description, avoids recursion
+        if depth != 0:
+            return {"type": "swarm", "id": self.id}
+        desc = {
+            "type": "swarm",
+            "id": self.id,
+            "center_of_mass": describe_position(self.position),
+            "num_drones": self.num_drones,
+            "num_drone_specializations": self.num_drone_specializations,
+            "target": self.target.describe(depth + 1),
+            "is_encircling": self.is_encircling,
+        }
+        if self.is_encircling:
+            desc["radius"] = self.radius
+        return desc
+
+
+class Car:
+    def __init__(self, id, position, waypoints, speed):
+        self.id = id
+        self.position = np.asarray(position, dtype=float)
+        self.waypoints = [np.asarray(waypoint, dtype=float) for waypoint in waypoints]
+        self.current_waypoint_index = 0
+        self.speed = speed
+        self.size = 5
+
+    def update(self):
+        direction = self.waypoints[self.current_waypoint_index] - self.position
+        distance = np.linalg.norm(direction)
+        if distance < self.size:
+            self.current_waypoint_index = (self.current_waypoint_index + 1) % len(self.waypoints)
+        else:
+            self.position = self.position + direction / distance * self.speed
+
+    def describe(self, depth):
+        return {"type": "car", "id": self.id, "position": describe_position(self.position)}
+
+
+class Landmark:
+    def __init__(self, id, position):
+        self.id = id
+        self.position = np.asarray(position, dtype=float)
+
+    def describe(self, depth):
+        return {"type": "landmark", "id": self.id, "position": describe_position(self.position)}
+
+
+class NoFlyZone:
+    def __init__(self, id, lower_left_corner, upper_right_corner):
+        self.id = id
+        self.lower_left_corner = np.asarray(lower_left_corner, dtype=float)
+        self.upper_right_corner = np.asarray(upper_right_corner, dtype=float)
+
+    def describe(self, depth):
+        return {
+            "type": "no-fly zone",
+            "id": self.id,
+            "lower_left_corner": describe_position(self.lower_left_corner),
+            "upper_right_corner": describe_position(self.upper_right_corner),
+        }
+
+
+class SwarmEngine:
+    """
+    Headless equivalent of sketch.js. Implements the same command set as `functionRegistry` in mcp.js,
+    with the same return values, so it can stand in for the browser behind the MCP tools.
+
+    Scale, on one CPU core: a step takes about 1.5 ms for 1000 drones and 7-15 ms for 5000 in the default
+    600x600 world, and 80-120 ms for 100k drones in 6000x6000. Most of it is the neighbor pass, which grows with
+    drones x neighbors within BOIDS_DISTANCE, so steps get slower as swarms gather around their targets.
+    """
+
+    def __init__(self, num_drones=1000, width=600, height=600, seed=None):
+        self.width = width
+        self.height = height
+        self.rng = np.random.default_rng(seed)
+        self.id_counter = 0
+
+        # Per-drone state, structure of arrays
+        self.positions = np.zeros((0, 2), dtype=np.float32)
+        self.velocities = np.zeros((0, 2), dtype=np.float32)
+        self.specializations = np.zeros(0, dtype=np.int8)
+        self.swarm_slots = np.zeros(0, dtype=np.int32)  # -1 means the drone has no swarm
+
+        self.swarms = []
+        self.cars = []
+        self.landmarks = []
+        self.no_fly_zones = []
+        self.next_swarm_slot = 0
+
+        self.function_registry = {
+            "get_environment": self.get_environment,
+            "reassign_drones": self.reassign_drones,
+            "merge_swarm": self.merge_swarm,
+            "fork_swarm_to_follow": self.fork_swarm_to_follow,
+            "fork_swarm_to_position": self.fork_swarm_to_position,
+            "assign_swarm_to_follow": self.assign_swarm_to_follow,
+            "assign_swarm_to_position": self.assign_swarm_to_position,
+            "set_swarm_encircle": self.set_swarm_encircle,
+            "fork_swarm_to_waypoints": self.fork_swarm_to_waypoints,
+            "assign_swarm_to_waypoints": self.assign_swarm_to_waypoints,
+            "execute_commands": self.execute_commands,
+        }
+
+        self.setup(num_drones)
+
+    # Scenario setup, mirrors setup() in sketch.js
+    # =========================
+
+    def random_position(self):
+        return self.rng.uniform((0, 0), (self.width, self.height))
+
+    def generate_next_id(self):
+        phonetic_name = PHONETIC_NAMES[self.id_counter % len(PHONETIC_NAMES)]
+        new_id = f"{phonetic_name}-{self.id_counter // len(PHONETIC_NAMES)}"
+        self.id_counter += 1
+        return new_id
+
+    def new_swarm(self, target):
+        swarm = Swarm(self.generate_next_id(), self.next_swarm_slot, target)
+        self.next_swarm_slot += 1
+        self.swarms.append(swarm)
+        return swarm
+
+    def setup(self, num_drones):
+        for _ in range(4):
+            self.new_swarm(TargetMarker(self.random_position()))
+
+        indices = np.arange(num_drones)
+        self.positions = self.rng.uniform((0, 0), (self.width, self.height), size=(num_drones, 2)).astype(np.float32)
+        self.velocities = np.zeros((num_drones, 2), dtype=np.float32)
+        self.specializations = (indices % len(DRONE_SPECIALIZATIONS)).astype(np.int8)
+        swarm_slots = np.array([swarm.slot for swarm in self.swarms], dtype=np.int32)
+        self.swarm_slots = swarm_slots[indices % len(self.swarms)]
+
+        for _ in range(2):
+            waypoints = [self.random_position() for _ in range(6)]
+            self.cars.append(Car(self.generate_next_id(), self.random_position(), waypoints, 1.0))
+
+        for _ in range(3):
+            self.landmarks.append(Landmark(self.generate_next_id(), self.random_position()))
+
+        self.no_fly_zones.append(NoFlyZone(self.generate_next_id(), (300, 300), (500, 400)))
+
+        self.assign_swarm_to_follow(self.swarms[0].id, self.cars[0].id)
+        self.assign_swarm_to_waypoints(self.swarms[1].id, [{"x": 100, "y": 100}, {"x": 200, "y": 100}, {"x": 200, "y": 200}, {"x": 100, "y": 200}], True)
+        self.assign_swarm_to_follow(self.swarms[2].id, self.landmarks[0].id)
+        self.update_swarms()
+
+    # Simulation
+    # =========================
+    # A step is split in three, so the MCP server can compute it in a worker thread while commands change the
+    # engine: begin_step collects what the step reads (commands replace these arrays or, for swarm_slots,
+    # change a copy), compute_step only works on that, and end_step stores the result.
+
+    def step(self):
+        self.end_step(self.compute_step(self.begin_step()))
+
+    def swarm_arrays(self):
+        # Per-slot lookup tables for target position and encircling settings
+        size = self.next_swarm_slot
+        target_positions = np.zeros((size, 2), dtype=np.float32)
+        is_encircling = np.zeros(size, dtype=bool)
+        radii = np.zeros(size, dtype=np.float32)
+        for swarm in self.swarms:
+            target_positions[swarm.slot] = swarm.target.position
+            is_encircling[swarm.slot] = swarm.is_encircling
+            radii[swarm.slot] = swarm.radius
+        return target_positions, is_encircling, radii
+
+    def begin_step(self):
+        return (self.positions, self.velocities, self.swarm_slots.copy(), *self.swarm_arrays())
+
+    def compute_step(self, state):
+        # New positions and velocities of the drones
+        positions, velocities, slots, target_positions, is_encircling, radii = state
+        if len(positions) == 0:
+            return positions, velocities
+        separation, alignment = neighbor_forces(positions, velocities)
+        steer = (
+            separation * SEPARATION_WEIGHT
+            + alignment * ALIGNMENT_WEIGHT
+            + seek_forces(positions, slots, target_positions, is_encircling, radii) * SEEK_WEIGHT
+            + no_fly_forces(positions, self.no_fly_zones) * NO_FLY_WEIGHT
+        )
+        velocities = limit_magnitude(velocities + steer, DRONE_SPEED).astype(np.float32)
+
+        # if no swarm, stay still
+        velocities[slots < 0] = 0
+        return positions + velocities, velocities
+
+    def end_step(self, result):
+        self.positions, self.velocities = result
+        for car in self.cars:
+            car.update()
+        self.update_swarms()
+
+    def update_swarms(self):
+        # Center of mass and drone counts per swarm, computed for every swarm in one pass
+        size = self.next_swarm_slot
+        has_swarm = self.swarm_slots >= 0
+        slots = self.swarm_slots[has_swarm]
+        counts = np.bincount(slots, minlength=size)
+        totals = np.stack([np.bincount(slots, weights=self.positions[has_swarm, axis], minlength=size) for axis in range(2)], axis=1)
+        specialization_counts = np.bincount(
+            slots * len(DRONE_SPECIALIZATIONS) + self.specializations[has_swarm],
+            minlength=size * len(DRONE_SPECIALIZATIONS),
+        ).reshape(size, len(DRONE_SPECIALIZATIONS))
+
+        for swarm in self.swarms:
+            count = int(counts[swarm.slot])
+            if count > 0:
+                swarm.position = totals[swarm.slot] / count
+            else:
+                swarm.position = swarm.target.position.copy()  # If no drones, current position is target position
+            swarm.num_drones = count
+            swarm.num_drone_specializations = {
+                name: int(n) for name, n in zip(DRONE_SPECIALIZATIONS, specialization_counts[swarm.slot])
+            }
+
+            # if we are following a waypoint, update when we get close enough to the next waypoint
+            if isinstance(swarm.target, WayPoints):
+                if np.linalg.norm(swarm.position - swarm.target.position) < 10:
+                    if len(swarm.target.waypoints) > 1:
+                        swarm.target.shift()
+                    elif len(swarm.target.waypoints) == 1:
+                        swarm.target = swarm.target.waypoints[0]
+
+    # Helpers, mirror the internal functions in sketch.js
+    # =========================
+
+    def execute(self, command, args=None):
+        if command not in self.function_registry:
+            return {"error": "Unknown command: " + command}
+        return self.function_registry[command](**(args or {}))
+
+    @staticmethod
+    def resolve_step_references(args, results):
+        resolved = {}
+        for key, value in args.items():
+            match = STEP_REFERENCE.match(value) if isinstance(value, str) else None
+            if match:
+                step = int(match.group(1))
+                if step >= len(results):
+                    raise ValueError(f"Step {step} has not run yet")
+                value = results[step]["result"]
+            resolved[key] = value
+        return resolved
+
+    def find_swarm(self, swarm_id):
+        for swarm in self.swarms:
+            if swarm.id == swarm_id:
+                return swarm
+        return None
+
+    def get_swarm(self, swarm_id):
+        swarm = self.find_swarm(swarm_id)
+        if swarm is None:
+            raise ValueError(f"No swarm with id {swarm_id}")
+        return swarm
+
+    def get_entity(self, id):
+        for entity in self.swarms + self.cars + self.landmarks:
+            if entity.id == id:
+                return entity
+        raise ValueError(f"No entity with id {id}")
+
+    def deallocate_swarm(self, swarm_id):
+        swarm = self.find_swarm(swarm_id)
+        if swarm is None:
+            return False
+        self.swarm_slots[self.swarm_slots == swarm.slot] = -1
+        self.swarms.remove(swarm)
+        return True
+
+    def fork_swarm_to(self, source_swarm_id, num_drones, target):
+        source_swarm = self.get_swarm(source_swarm_id)
+        new_swarm = self.new_swarm(target)
+        new_swarm.is_encircling = source_swarm.is_encircling
+        new_swarm.radius = source_swarm.radius
+        self.reassign_drones(source_swarm_id, new_swarm.id, num_drones)
+        return new_swarm.id
+
+    def assign_swarm_to(self, swarm_id, target):
+        self.get_swarm(swarm_id).target = target
+        return True
+
+    @staticmethod
+    def waypoints_from_coords(waypoints, cycle):
+        return WayPoints([TargetMarker((coords["x"], coords["y"])) for coords in waypoints], cycle)
+
+    # MCP functions
+    # =========================
+
+    def get_environment(self):
+        return {
+            "swarms": [swarm.describe(0) for swarm in self.swarms],
+            "cars": [car.describe(0) for car in self.cars],
+            "landmarks": [landmark.describe(0) for landmark in self.landmarks],
+            "no-fly zones": [no_fly_zone.describe(0) for no_fly_zone in self.no_fly_zones],
+        }
+
+    def reassign_drones(self, source_swarm_id, target_swarm_id, num_drones):
+        from_swarm = self.find_swarm(source_swarm_id)
+        to_swarm = self.find_swarm(target_swarm_id)
+        if from_swarm is None or to_swarm is None:
+            return False
+
+        drones_from_source = np.flatnonzero(self.swarm_slots == from_swarm.slot)
+        drones_to_reassign = drones_from_source[:max(int(num_drones), 0)]
+        self.swarm_slots[drones_to_reassign] = to_swarm.slot
+
+        # remove the source swarm if all drones are moved out of it
+        if len(drones_to_reassign) == len(drones_from_source):
+            self.deallocate_swarm(source_swarm_id)
+
+        return len(drones_to_reassign)
+
+    def merge_swarm(self, source_swarm_id, target_swarm_id):
+        from_swarm = self.get_swarm(source_swarm_id)
+        num_drones = int(np.count_nonzero(self.swarm_slots == from_swarm.slot))
+        self.reassign_drones(source_swarm_id, target_swarm_id, num_drones)
+        self.deallocate_swarm(source_swarm_id)
+        return target_swarm_id
+
+    def fork_swarm_to_follow(self, source_swarm_id, num_drones, target_id):
+        return self.fork_swarm_to(source_swarm_id, num_drones, self.get_entity(target_id))
+
+    def fork_swarm_to_position(self, source_swarm_id, num_drones, x, y):
+        return self.fork_swarm_to(source_swarm_id, num_drones, TargetMarker((x, y)))
+
+    def fork_swarm_to_waypoints(self, source_swarm_id, num_drones, waypoints, cycle):
+        return self.fork_swarm_to(source_swarm_id, num_drones, self.waypoints_from_coords(waypoints, cycle))
+
+    def assign_swarm_to_follow(self, swarm_id, target_id):
+        return self.assign_swarm_to(swarm_id, self.get_entity(target_id))
+
+    def assign_swarm_to_position(self, swarm_id, x, y):
+        return self.assign_swarm_to(swarm_id, TargetMarker((x, y)))
+
+    def assign_swarm_to_waypoints(self, swarm_id, waypoints, cycle):
+        return self.assign_swarm_to(swarm_id, self.waypoints_from_coords(waypoints, cycle))
+
+    def set_swarm_encircle(self, swarm_id, is_encircling, radius):
+        swarm = self.get_swarm(swarm_id)
+        swarm.is_encircling = is_encircling
+        swarm.radius = radius
+        return swarm.is_encircling
+
+    def execute_commands(self, commands):
+        # Same contract as execute_commands in mcp.js
+        results = []
+        for step in commands:
+            if step.get("command") not in self.function_registry or step["command"] == "execute_commands":
+                results.append({"error": f"Unknown command: {step.get('command')}"})
+                break
+            try:
+                args = self.resolve_step_references(step.get("args") or {}, results)
+                results.append({"result": self.function_registry[step["command"]](**args)})
+            except (ValueError, TypeError, KeyError) as e:
+                results.append({"error": str(e)})
+                break
+        return results
@@ -0,0 +1,112 @@
+# Run from swarm-simulation with: python -m pytest tests
+import asyncio
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent_scheduler import AgentScheduler, is_correction  # noqa: E402
+from intent_parser import IntentParser  # noqa: E402
+
+MERGE_TOOL = types.SimpleNamespace(
+    name="merge_swarm",
+    inputSchema={
+        "properties": {"source_swarm_id": {"type": "string"}, "target_swarm_id": {"type": "string"}},
+        "required": ["source_swarm_id", "target_swarm_id"],
+    },
+)
+parser = IntentParser([MERGE_TOOL])
+
+
+def is_command(text):
+    return parser.parse(text) is not None
+
+
+@pytest.mark.parametrize(
+    "prompt",
+    [
+        "No, send Bravo-0 instead.",
+        "No. Merge Charlie-0 into Alpha-0.",
+        "Wait, merge Charlie-0 into Alpha-0.",
+        "Stop!",
+        "Cancel that.",
+        "No not Bravo-0, Charlie-0.",
+        "Scratch that, merge Charlie-0 into Alpha-0.",
+        "Actually merge Charlie-0 into Alpha-0.",
+        "Merge Charlie-0 into Alpha-0 instead.",
+    ],
+)
+def test_corrections(prompt):
+    assert is_correction(prompt)
+    assert is_correction(prompt, is_command)
+
+
+@pytest.mark.parametrize(
+    "prompt",
+    [
+        "Stop Alpha-0 encircling.",
+        "stop alpha 0 encircling",
+        "No-fly zone Kilo-0 should be avoided by Bravo-0.",
+        "No fly zone Kilo-0 is where Alpha-0 goes.",
+        "Wait for Bravo-0 at the landmark.",
+        "Cancel the fork of Delta-0 by merging it back.",
+        "Nobody should follow car Echo-0.",
+        "Merge Bravo-0 into Alpha-0.",
+    ],
+)
+def test_commands_starting_with_correction_words(prompt):
+    assert not is_correction(prompt)
+    assert not is_correction(prompt, is_command)
+
+
+def test_leading_word_before_a_standalone_command():
+    # Without a pause, "wait" is still a correction when the rest is a command by itself
+    assert not is_correction("wait merge Charlie-0 into Alpha-0")
+    assert is_correction("wait merge Charlie-0 into Alpha-0", is_command)
+
+
+def run_scheduler(utterances, is_command=None):
+    # Submit utterances while the first one is still running, return the prompts that were run to completion
+    async def scenario():
+        started = asyncio.Event()
+        finished = []
+
+        async def handler(utterance_id, prompt):
+            started.set()
+            await asyncio.sleep(0.05)
+            finished.append(prompt)
+
+        scheduler = AgentScheduler(handler, "correction", is_command=is_command)
+        runner = asyncio.create_task(scheduler.run())
+        await scheduler.submit((0, utterances[0]))
+        await started.wait()
+        for utterance_id, prompt in enumerate(utterances[1:], 1):
+            await scheduler.submit((utterance_id, prompt))
+        await scheduler.join()
+        runner.cancel()
+        return finished
+
+    return asyncio.run(scenario())
+
+
+def test_command_starting_with_stop_waits_its_turn():
+    finished = run_scheduler(["Merge Bravo-0 into Alpha-0.", "Stop Alpha-0 encircling."], is_command)
+    assert finished == ["Merge Bravo-0 into Alpha-0.", "Stop Alpha-0 encircling."]
+
+
+def test_correction_replaces_queued_command():
+    finished = run_scheduler(
+        ["Merge Bravo-0 into Alpha-0.", "Merge Charlie-0 into Alpha-0.", "No, Delta-0 instead."], is_command
+    )
+    assert finished[0] == "Merge Bravo-0 into Alpha-0."
+    assert len(finished) == 2
+    assert "Merge Charlie-0 into Alpha-0." in finished[1] and "No, Delta-0 instead." in finished[1]
+
+
+def test_correction_cancels_running_command():
+    finished = run_scheduler(["Merge Bravo-0 into Alpha-0.", "Wait, merge Charlie-0 into Alpha-0."])
+    assert len(finished) == 1
+    assert "Merge Bravo-0 into Alpha-0." in finished[0] and "Wait, merge Charlie-0" in finished[0]
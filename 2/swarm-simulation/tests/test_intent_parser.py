@@ -0,0 +1,51 @@
+# Run from swarm-simulation with: python -m pytest tests
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_parser import IntentParser, check_ids, normalize  # noqa: E402
+
+
+def tool(name, **properties):
+    return types.SimpleNamespace(
+        name=name,
+        inputSchema={
+            "properties": {param: {"type": kind} for param, kind in properties.items()},
+            "required": list(properties),
+        },
+    )
+
+
+parser = IntentParser(
+    [
+        tool("merge_swarm", source_swarm_id="string", target_swarm_id="string"),
+        tool("assign_swarm_to_position", swarm_id="string", x="number", y="number"),
+    ]
+)
+ENVIRONMENT = {"swarms": [{"id": "Alpha-0"}, {"id": "Bravo-0"}]}
+
+
+def test_normalize_keeps_minus_signs_of_numbers_only():
+    assert normalize("Send Alpha-0 to -100, 200.") == "send alpha 0 to -100 200"
+    assert normalize("Send Alpha-0 to 100-200") == "send alpha 0 to 100 200"
+
+
+@pytest.mark.parametrize(
+    "prompt, x, y",
+    [
+        ("Send Alpha-0 to -100 200", -100, 200),
+        ("Send Alpha-0 to x -12.5 y -40", -12.5, -40),
+        ("Send Alpha-0 to 100 200", 100, 200),
+    ],
+)
+def test_signed_coordinates(prompt, x, y):
+    assert parser.parse(prompt) == [("assign_swarm_to_position", {"swarm_id": "Alpha-0", "x": x, "y": y})]
+
+
+def test_merge_into_itself_is_rejected():
+    assert check_ids(parser.parse("Merge Alpha-0 into Bravo-0"), ENVIRONMENT)
+    assert not check_ids(parser.parse("Merge Alpha-0 into Alpha-0"), ENVIRONMENT)
@@ -0,0 +1,100 @@
+# Run from swarm-simulation with: python -m pytest tests
+import asyncio
+import importlib.util
+import os
+import sys
+
+import pytest
+
+DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIR)
+
+from mcp.shared.memory import create_connected_server_and_client_session  # noqa: E402
+
+from plan_cache import failed, tool_result  # noqa: E402
+from session_memory import SessionMemory  # noqa: E402
+from swarm_engine import SwarmEngine  # noqa: E402
+
+spec = importlib.util.spec_from_file_location("swarm_mcp_server", os.path.join(DIR, "swarm-mcp-server.py"))
+server = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(server)
+
+
+def call_tools(calls):
+    # Call the tools of the real MCP server, running the headless engine, and return their CallToolResults
+    async def scenario():
+        server.backend = server.HeadlessSimulation(SwarmEngine(num_drones=60, seed=0), 60)
+        server.environment_cache = server.EnvironmentCache()
+        async with create_connected_server_and_client_session(server.mcp) as session:
+            return [await session.call_tool(name, args) for name, args in calls]
+
+    return asyncio.run(scenario())
+
+
+@pytest.fixture
+def swarm_ids():
+    environment = tool_result(call_tools([("get_environment", {})])[0])
+    return [swarm["id"] for swarm in environment["swarms"]]
+
+
+def test_list_result_is_read_whole(swarm_ids):
+    commands = [
+        {
+            "command": "fork_swarm_to_position",
+            "args": {"source_swarm_id": swarm_ids[0], "num_drones": 2, "x": 10, "y": 20},
+        },
+        {"command": "merge_swarm", "args": {"source_swarm_id": "$0", "target_swarm_id": swarm_ids[1]}},
+    ]
+    (result,) = call_tools([("execute_commands", {"commands": commands})])
+    assert len(result.content) == 2  # One text block per list item
+    value = tool_result(result)
+    assert isinstance(value, list) and len(value) == 2
+    assert value[1] == {"result": swarm_ids[1]}
+
+
+def test_scalar_and_dict_results(swarm_ids):
+    follow, position, missing = call_tools(
+        [
+            ("assign_swarm_to_follow", {"swarm_id": swarm_ids[0], "target_id": swarm_ids[1]}),
+            ("merge_swarm", {"source_swarm_id": swarm_ids[0], "target_swarm_id": swarm_ids[1]}),
+            ("get_environment_delta", {"since_version": -1}),
+        ]
+    )
+    assert tool_result(follow) is True
+    assert tool_result(position) == swarm_ids[1]
+    assert tool_result(missing)["reset"] is True
+
+
+def test_session_memory_tracks_batched_commands(swarm_ids):
+    commands = [
+        {
+            "command": "fork_swarm_to_position",
+            "args": {"source_swarm_id": swarm_ids[0], "num_drones": 2, "x": 10, "y": 20},
+        },
+        {"command": "merge_swarm", "args": {"source_swarm_id": swarm_ids[1], "target_swarm_id": swarm_ids[0]}},
+    ]
+    (result,) = call_tools([("execute_commands", {"commands": commands})])
+    memory = SessionMemory(2000)
+    memory.record("split and merge", "Done.", [("execute_commands", {"commands": commands}, tool_result(result))], None)
+    forked = tool_result(result)[0]["result"]
+    assert f"- {forked}: forked from {swarm_ids[0]} with 2 drones, heading to (10, 20)" in memory.summary_text()
+    assert f"- {swarm_ids[1]}: merged into {swarm_ids[0]}, no longer exists" in memory.summary_text()
+
+
+def test_replayed_batch_with_a_failing_step_fails(swarm_ids):
+    move = {"command": "assign_swarm_to_position", "args": {"swarm_id": swarm_ids[0], "x": 10, "y": 20}}
+    reassign = {
+        "command": "reassign_drones",
+        "args": {"source_swarm_id": swarm_ids[1], "target_swarm_id": swarm_ids[0], "num_drones": 2},
+    }
+    missing_source = {**reassign, "args": {**reassign["args"], "source_swarm_id": "Zulu-9"}}
+    recorded, replayed = call_tools(
+        [
+            ("execute_commands", {"commands": [move, reassign]}),
+            ("execute_commands", {"commands": [move, missing_source]}),
+        ]
+    )
+    assert not failed(tool_result(recorded), tool_result(recorded))
+    assert tool_result(replayed)[1] == {"result": False}  # The step ran, reassign_drones found no such swarm
+    assert failed(tool_result(replayed), tool_result(recorded))
+    assert failed(tool_result(replayed)[:1], tool_result(recorded))  # A step that never ran
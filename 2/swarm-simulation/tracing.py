@@ -0,0 +1,121 @@
+# Per-stage timing shared by the voice agent and the swarm MCP server.
+# Spans are tagged with the utterance they belong to, appended to a JSONL trace file, and aggregated
+# into latency histograms that can be read over HTTP from /metrics.
+import collections
+import contextlib
+import contextvars
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000]
+RECENT_SAMPLES = 1000  # Per stage, used for the percentiles
+
+# The utterance being handled, picked up by spans that are not given one explicitly
+current_utterance = contextvars.ContextVar("current_utterance", default=None)
+
+
+class StageStats:
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)  # The last bucket is everything above the largest bound
+        self.recent = collections.deque(maxlen=RECENT_SAMPLES)
+
+    def add(self, duration_ms):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        bucket = next((i for i, bound in enumerate(HISTOGRAM_BUCKETS_MS) if duration_ms <= bound), len(HISTOGRAM_BUCKETS_MS))
+        self.buckets[bucket] += 1
+        self.recent.append(duration_ms)
+
+    def summary(self):
+        recent = sorted(self.recent)
+
+        def percentile(p):
+            return recent[min(len(recent) - 1, int(p / 100 * len(recent)))] if recent else None
+
+        return {
+            "count": self.count,
+            "mean_ms": self.total_ms / self.count if self.count else None,
+            "max_ms": self.max_ms,
+            "p50_ms": percentile(50),
+            "p95_ms": percentile(95),
+            "p99_ms": percentile(99),
+            "histogram_ms": dict(zip([f"le_{bound}" for bound in HISTOGRAM_BUCKETS_MS] + ["inf"], self.buckets)),
+        }
+
+
+class Tracer:
+    def __init__(self):
+        self.service = None
+        self.trace_file = None
+        self.stats = collections.defaultdict(StageStats)
+        self.lock = threading.Lock()  # Spans are recorded from the event loop and from worker threads
+
+    def configure(self, service, trace_path=None, metrics_port=None):
+        self.service = service
+        if trace_path:
+            self.trace_file = open(trace_path, "a", buffering=1)  # Line buffered, one span per line
+        if metrics_port:
+            self.serve_metrics(metrics_port)
+
+    def record(self, stage, duration, utterance_id=None, **attributes):
+        if utterance_id is None:
+            utterance_id = current_utterance.get()
+        duration_ms = duration * 1000
+        with self.lock:
+            self.stats[stage].add(duration_ms)
+            if self.trace_file is not None:
+                span = {
+                    "service": self.service,
+                    "stage": stage,
+                    "utterance_id": utterance_id,
+                    "end": time.time(),
+                    "duration_ms": round(duration_ms, 3),
+                    **attributes,
+                }
+                self.trace_file.write(json.dumps(span) + "\n")
+
+    @contextlib.contextmanager
+    def span(self, stage, utterance_id=None, **attributes):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, utterance_id, **attributes)
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "service": self.service,
+                "stages": {stage: stats.summary() for stage, stats in self.stats.items()},
+            }
+
+    def serve_metrics(self, port):
+        tracer = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = json.dumps(tracer.metrics(), indent=2).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Keep the console for the agent's own output
+
+        server = ThreadingHTTPServer(("localhost", port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"[INFO] Metrics at http://localhost:{port}/metrics")
+
+
+tracer = Tracer()
@@ -0,0 +1,215 @@
+# Pool of transcription worker processes for the voice agent.
+# Each worker loads its own Whisper model once, so inference runs outside the agent's process (and GIL).
+# Audio is handed over through shared memory and results come back as futures.
+# The pool hands each worker one task at a time through the worker's own queue, so it always knows which
+# transcription a worker holds: one that dies (crash, out of memory, killed) fails that transcription and is replaced.
+import collections
+import itertools
+import multiprocessing as mp
+import multiprocessing.connection
+import os
+import threading
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+MAX_STARTUP_FAILURES = 3  # Workers dying before their model is loaded, after which the pool gives up
+
+
+def worker_main(worker_index, model_name, num_threads, tasks, results):
+    # Messages to the pool are (kind, worker index, payload), the task they are about is the one it handed out
+    import torch
+    import whisper
+
+    # Split the cores between the workers instead of every worker trying to use all of them
+    torch.set_num_threads(num_threads)
+    model = whisper.load_model(model_name)
+    results.put(("ready", worker_index, None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        block_name, num_samples, initial_prompt = task
+        try:
+            block = shared_memory.SharedMemory(name=block_name)
+            try:
+                # Whisper keeps torch views of its input alive, so work on a private copy and release the block right away
+                audio_np = np.ndarray((num_samples,), dtype=np.float32, buffer=block.buf).copy()
+            finally:
+                block.close()
+            result = model.transcribe(audio_np, initial_prompt=initial_prompt)
+            results.put((
+                "done",
+                worker_index,
+                {
+                    "text": result["text"],
+                    "segments": [
+                        {"start": segment["start"], "end": segment["end"], "text": segment["text"]}
+                        for segment in result["segments"]
+                    ],
+                },
+            ))
+        except Exception as e:
+            results.put(("error", worker_index, repr(e)))
+
+
+class TranscriptionPool:
+    """
+    Worker processes that transcribe float32 16 kHz mono audio.
+    submit() returns a concurrent.futures.Future with a dict holding 'text' and 'segments' (like
+    whisper's transcribe); results complete in whatever order the workers finish. A transcription whose
+    worker died fails with a RuntimeError, the rest carry on once a replacement worker has loaded its model.
+    """
+
+    def __init__(self, num_workers, model_name="base"):
+        self.context = mp.get_context("spawn")  # torch does not survive a fork of a process that has threads
+        self.model_name = model_name
+        self.results = self.context.Queue()
+        self.num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+        self.inboxes = [None] * num_workers  # Per worker, a new queue for every process so none inherits a task
+        self.workers = [self.spawn(worker_index) for worker_index in range(num_workers)]
+        self.futures = {}  # task ID -> Future
+        self.blocks = {}  # task ID -> shared memory holding its audio, freed once the result is in
+        self.backlog = collections.deque()  # (task ID, task) not handed to a worker yet
+        self.running = {}  # worker index -> ID of the task it was handed, finish() ignores it if already done
+        self.task_ids = itertools.count()
+        self.lock = threading.Lock()
+        self.ready = set()  # Indexes of the workers that have loaded their model
+        self.all_ready = threading.Event()
+        self.startup_failures = 0
+        self.error = None  # Set when the workers can't be started, every call fails with it from then on
+
+    def spawn(self, worker_index):
+        self.inboxes[worker_index] = self.context.Queue()
+        return self.context.Process(
+            target=worker_main,
+            args=(worker_index, self.model_name, self.num_threads, self.inboxes[worker_index], self.results),
+            daemon=True,
+        )
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+        threading.Thread(target=self.collect_results, daemon=True).start()
+        threading.Thread(target=self.watch_workers, daemon=True).start()
+
+    def wait_until_ready(self):
+        # Blocks until every worker has loaded its model
+        self.all_ready.wait()
+        if self.error is not None:
+            raise self.error
+
+    def submit(self, audio_np, initial_prompt=None):
+        if self.error is not None:
+            raise self.error
+        audio_np = np.asarray(audio_np, dtype=np.float32)
+        block = shared_memory.SharedMemory(create=True, size=max(1, audio_np.nbytes))
+        future = Future()
+        task_id = next(self.task_ids)
+        with self.lock:
+            self.futures[task_id] = future
+            self.blocks[task_id] = block
+        try:
+            np.ndarray(audio_np.shape, dtype=np.float32, buffer=block.buf)[:] = audio_np
+            with self.lock:
+                self.backlog.append((task_id, (block.name, len(audio_np), initial_prompt)))
+                self.dispatch()
+        except BaseException:
+            self.finish(task_id, error=RuntimeError("Could not hand the audio to the workers"))  # Frees the block
+            raise
+        return future
+
+    def dispatch(self):
+        # Hand waiting tasks to idle workers, with self.lock held. A task is owned by its worker from here on.
+        for worker_index in sorted(self.ready):
+            if not self.backlog:
+                return
+            if worker_index in self.running:
+                continue
+            task_id, task = self.backlog.popleft()
+            if task_id not in self.futures:
+                continue  # Already failed, e.g. by submit
+            self.running[worker_index] = task_id
+            self.inboxes[worker_index].put(task)
+
+    def finish(self, task_id, result=None, error=None):
+        # Free the task's audio and complete its future, once: a task can fail here before a late result arrives
+        with self.lock:
+            future = self.futures.pop(task_id, None)
+            block = self.blocks.pop(task_id, None)
+        try:
+            if block is not None:
+                block.close()
+                block.unlink()
+        finally:
+            if future is not None:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+    def watch_workers(self):
+        # Tell collect_results about dead workers through the results queue, so everything a worker managed to
+        # send before it died (e.g. its last result) is handled first
+        reported = set()
+        while self.error is None:
+            workers = list(self.workers)
+            mp.connection.wait([worker.sentinel for worker in workers], timeout=1.0)
+            for worker_index, worker in enumerate(workers):
+                if not worker.is_alive() and (worker_index, worker.pid) not in reported:
+                    reported.add((worker_index, worker.pid))
+                    self.results.put(("died", worker_index, None))
+
+    def worker_done(self, worker_index):
+        # The worker is idle again, returns the ID of the task it finished
+        with self.lock:
+            task_id = self.running.pop(worker_index, None)
+            self.dispatch()
+        return task_id
+
+    def worker_died(self, worker_index):
+        exit_code = self.workers[worker_index].exitcode
+        with self.lock:
+            task_id = self.running.pop(worker_index, None)
+            was_ready = worker_index in self.ready
+            self.ready.discard(worker_index)
+        if task_id is not None:
+            self.finish(task_id, error=RuntimeError(f"Transcription worker died (exit code {exit_code})"))
+        if was_ready:
+            self.startup_failures = 0
+        else:
+            self.startup_failures += 1
+            if self.startup_failures >= MAX_STARTUP_FAILURES:
+                self.error = RuntimeError(
+                    f"Transcription workers keep dying while loading the model (exit code {exit_code})"
+                )
+                print(f"[WARN] {self.error}")
+                with self.lock:
+                    pending = list(self.futures)
+                    self.backlog.clear()
+                for pending_id in pending:
+                    self.finish(pending_id, error=self.error)
+                self.all_ready.set()  # wait_until_ready raises the error
+                return
+        print(f"[WARN] Transcription worker {worker_index} died (exit code {exit_code}), starting a new one")
+        worker = self.spawn(worker_index)
+        worker.start()
+        self.workers[worker_index] = worker  # Only once started, watch_workers waits on its sentinel
+
+    def collect_results(self):
+        while True:
+            kind, worker_index, payload = self.results.get()
+            if kind == "ready":
+                with self.lock:
+                    self.ready.add(worker_index)
+                    self.dispatch()
+                if len(self.ready) == len(self.workers):
+                    self.all_ready.set()
+            elif kind == "died":
+                self.worker_died(worker_index)
+            elif kind == "error":
+                self.finish(self.worker_done(worker_index), error=RuntimeError(f"Transcription failed: {payload}"))
+            else:
+                self.finish(self.worker_done(worker_index), result=payload)
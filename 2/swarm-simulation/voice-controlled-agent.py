@@ -1,52 +1,145 @@
-import whisper
-import sounddevice as sd
 import numpy as np
-import scipy.io.wavfile as wav
-from pynput import keyboard
-import tempfile
 import threading
 import queue
 import asyncio
 import argparse
+import json
+import time
+import uuid
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from agents import Agent, Runner
 from agents.mcp import MCPServerSse
 from agents.model_settings import ModelSettings
+from intent_parser import IntentParser, check_ids
+from agent_scheduler import POLICIES, AgentScheduler
+from plan_cache import PlanCache, created_id, failed, substitute, tool_result
+from session_memory import SessionMemory, describe_call, refers_to_context
+from tracing import current_utterance, tracer
+from transcription_pool import TranscriptionPool
 
-print("[INFO] Loading Whisper model...")
-model = whisper.load_model("base")
-print("[INFO] Whisper model loaded.")
+transcription_pool = None  # TranscriptionPool of Whisper worker processes, started during startup
+stream = None  # Audio input stream, opened during startup
 SAMPLE_RATE = 16000
 CHANNELS = 1
+MAX_RECORDING_SECONDS = 60  # Longer utterances keep only their most recent audio
 recording = False
-audio = []
+recording_started_at = None
+recording_utterance_id = None  # ID of the utterance being recorded
+recording_prefetch = None  # Future of the environment read started when recording began
+
+STREAM_COMMIT_MARGIN = 1.0  # Seconds, segments ending closer than this to the end of the audio are not committed yet
+STREAM_MIN_SECONDS = 0.5  # Shortest window worth decoding
+stream_interval = None  # Seconds between partial transcriptions while recording, None disables streaming
+current_stream = None  # StreamingTranscription of the utterance being recorded
+stream_finisher = ThreadPoolExecutor()  # Waits for streaming transcriptions to finish without blocking the keyboard
 
 audio_id_counter = 0  # Counter for audio segments
 
-audio_queue = queue.Queue()  # For audio to be transcribed
-transcription_queue = asyncio.Queue()  # For transcribed text to be processed by agent
+audio_queue = queue.Queue()  # Pending transcriptions, in utterance order
+MAX_PENDING_UTTERANCES = 4  # Utterances waiting for the agent, more hold up the transcription thread
+transcription_queue = asyncio.Queue(maxsize=MAX_PENDING_UTTERANCES)  # For transcribed text to be processed by agent
+schedule_policy = "correction"  # See agent_scheduler.py
 
 ready_event = threading.Event()  # Event to signal when the agent is ready
+intent_parser = None  # IntentParser built from the MCP tool list, None when the fast path is off
+plan_cache = None  # PlanCache of the agent's tool calls per command, None when disabled
+session_memory = None  # SessionMemory of earlier commands, None when the agent gets each command on its own
+# Tool calls of the agent run in progress, as (tool name, arguments, result, is_error), see TracedMCPServerSse
+recorded_calls = contextvars.ContextVar("recorded_calls", default=None)
+mcp_server = None  # MCP session, set once connected, used to prefetch the environment from the keyboard thread
+prefetch_enabled = True
+handled_utterances = 0  # Utterances the agent worker has finished, a prefetch taken before one finished is stale
+
+
+class AudioRingBuffer:
+    """
+    Preallocated float32 capture buffer for the utterance being recorded.
+    Blocks from the audio callback are copied into place without allocating. Once the buffer is full the
+    oldest samples are overwritten, so memory stays bounded no matter how long the key is held.
+    """
+
+    def __init__(self, max_seconds):
+        self.buffer = np.zeros(int(max_seconds * SAMPLE_RATE), dtype=np.float32)
+        self.written = 0  # Samples written since the last reset, including overwritten ones
+        self.lock = threading.Lock()
+
+    def reset(self):
+        with self.lock:
+            self.written = 0
+
+    def write(self, block):
+        samples = block[:, 0]  # Mono, a view into the callback's buffer
+        size = len(self.buffer)
+        with self.lock:
+            skipped = max(0, len(samples) - size)
+            samples = samples[skipped:]
+            start = (self.written + skipped) % size
+            first = min(len(samples), size - start)
+            self.buffer[start : start + first] = samples[:first]
+            self.buffer[: len(samples) - first] = samples[first:]
+            self.written += skipped + len(samples)
+
+    def read(self, start=0):
+        # Copy of the samples from `start` on, in order. Returns the index of the first sample actually
+        # returned, which is later than `start` if those samples have been overwritten.
+        size = len(self.buffer)
+        with self.lock:
+            start = max(start, self.written - size, 0)
+            length = self.written - start
+            samples = np.empty(length, dtype=np.float32)
+            begin = start % size
+            first = min(length, size - begin)
+            samples[:first] = self.buffer[begin : begin + first]
+            samples[first:] = self.buffer[: length - first]
+        return start, samples
+
+
+capture = AudioRingBuffer(MAX_RECORDING_SECONDS)
 
 
 # Recording and audio queueing
 def audio_callback(indata, frames, time, status):
     if recording:
-        audio.append(indata.copy())
+        capture.write(indata)
 
 
 def start_recording():
-    global recording, audio
+    global recording, recording_started_at, recording_utterance_id, recording_prefetch, current_stream
+    capture.reset()
     recording = True
-    audio = []
+    recording_started_at = time.perf_counter()
+    recording_utterance_id = uuid.uuid4().hex[:12]  # Follows this utterance through the agent, MCP server and browser
+    # Read the environment while the operator is still speaking, so the agent doesn't have to
+    recording_prefetch = None
+    if prefetch_enabled and mcp_server is not None:
+        recording_prefetch = asyncio.run_coroutine_threadsafe(
+            prefetch_environment(recording_utterance_id), agent_loop
+        )
+    if stream_interval is not None:
+        current_stream = StreamingTranscription(capture, stream_interval)
+        current_stream.start()
     print("🎙️  Listening...")
 
 
 def stop_recording_and_queue():
-    global recording, audio, audio_id_counter
+    global recording, audio_id_counter
     recording = False
     print("🛑  Recording stopped. Queuing for transcription...")
-    audio_np = np.concatenate(audio, axis=0)
-    audio_queue.put((audio_np, audio_id_counter))
+    released_at = time.perf_counter()
+    utterance_id = recording_utterance_id
+    tracer.record("recording", released_at - recording_started_at, utterance_id)
+    audio_start, audio_np = capture.read()
+    # Submit right away so utterances are transcribed in parallel, transcribe_worker restores their order
+    if current_stream is not None:
+        current_stream.stop()
+        future = stream_finisher.submit(current_stream.finish, audio_np, audio_start)
+    else:
+        future = transcription_pool.submit(audio_np)
+    future.add_done_callback(
+        lambda _: tracer.record("transcription", time.perf_counter() - released_at, utterance_id)
+    )
+    audio_queue.put((audio_id_counter, utterance_id, future, recording_prefetch))
     audio_id_counter += 1
 
 
@@ -60,79 +153,460 @@ def on_release(key):
         stop_recording_and_queue()
 
 
-# Transcription worker (thread)
+def transcribe_audio(audio_np, initial_prompt=None):
+    # Whisper takes 16 kHz mono float32 directly, no need for a WAV file and ffmpeg
+    return transcription_pool.submit(audio_np, initial_prompt).result()
+
+
+class StreamingTranscription:
+    """
+    Transcribes an utterance while it is still being recorded.
+    Every interval the audio after the committed point is decoded. Segments that ended well before the end
+    of that window are committed, their text is kept and their audio is never decoded again, so on release
+    only the uncommitted tail has to be transcribed.
+    """
+
+    def __init__(self, capture, interval):
+        self.capture = capture
+        self.interval = interval
+        self.committed_text = ""
+        self.committed_samples = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        # No more partial transcriptions, the recording has ended
+        self.stopped.set()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.decode_window(*self.capture.read(self.committed_samples))
+            except RuntimeError as e:
+                print(f"[WARN] Partial transcription failed, trying again: {e}")
+
+    def decode_window(self, window_start, window):
+        if len(window) < STREAM_MIN_SECONDS * SAMPLE_RATE:
+            return
+        result = transcribe_audio(window, initial_prompt=self.committed_text or None)
+        window_seconds = len(window) / SAMPLE_RATE
+        committed_seconds = 0.0
+        # The last segment may still be cut off mid-word, never commit it
+        for segment in result["segments"][:-1]:
+            if segment["end"] > window_seconds - STREAM_COMMIT_MARGIN:
+                break
+            self.committed_text += segment["text"]
+            committed_seconds = segment["end"]
+        if committed_seconds > 0:
+            self.committed_samples = window_start + int(committed_seconds * SAMPLE_RATE)
+
+    def finish(self, audio_np, audio_start):
+        # Wait for a partial transcription still in progress, then decode only what has not been committed
+        self.stop()
+        self.thread.join()
+        tail = audio_np[max(0, self.committed_samples - audio_start) :]
+        if len(tail) < STREAM_MIN_SECONDS * SAMPLE_RATE and self.committed_text:
+            return {"text": self.committed_text}
+        tail_text = transcribe_audio(tail, initial_prompt=self.committed_text or None)["text"]
+        return {"text": self.committed_text + tail_text}
+
+
+# Transcription worker (thread), hands transcriptions to the agent in the order they were spoken
 def transcribe_worker():
     while True:
-        audio_np, audio_id = audio_queue.get()
+        audio_id, utterance_id, future, prefetch = audio_queue.get()
         print(f"📝 Transcribing audio file {audio_id}\n")
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmpfile:
-            wav.write(tmpfile.name, SAMPLE_RATE, (audio_np * 32767).astype(np.int16))
-            result = model.transcribe(tmpfile.name)
-            print(f"📝 Transcription: {result['text']}\n")
-            # Put transcription into the async queue for the agent
-            asyncio.run_coroutine_threadsafe(
-                transcription_queue.put(result["text"]), agent_loop
-            )
+        try:
+            text = future.result()["text"]
+        except Exception as e:
+            # e.g. the Whisper worker died, the pool has replaced it for the next utterance
+            print(f"[WARN] Could not transcribe audio file {audio_id}, please say it again: {e}\n")
+            audio_queue.task_done()
+            continue
+        print(f"📝 Transcription: {text}\n")
+        # Put transcription into the async queue for the agent, waiting while the agent is too far behind
+        if transcription_queue.full():
+            print("[WARN] Agent is behind, holding transcriptions until it catches up")
+        asyncio.run_coroutine_threadsafe(
+            transcription_queue.put((utterance_id, text, prefetch)), agent_loop
+        ).result()
         audio_queue.task_done()
 
 
-# Agent worker (async)
-async def agent_worker(agent):
-    print("[INFO] Agent is ready and waiting for transcriptions...")
+async def read_environment(server):
+    # The full environment, as the agent would read it. None if the browser can't be reached.
+    result = await server.call_tool("get_environment", {})
+    return None if result.isError else tool_result(result)
+
+
+async def prefetch_environment(utterance_id):
+    current_utterance.set(utterance_id)
+    started_after = handled_utterances
+    with tracer.span("environment_prefetch", utterance_id):
+        return started_after, await read_environment(mcp_server)
+
+
+async def prefetched_environment(prefetch):
+    # The environment read when recording began, unless a command was handled since (it may have changed it)
+    try:
+        started_after, environment = await asyncio.wrap_future(prefetch)
+    except Exception as e:
+        print(f"[WARN] Environment prefetch failed: {e}")
+        return None
+    return environment if started_after == handled_utterances else None
+
+
+def agent_input(prompt, environment):
+    if environment is None:
+        return prompt
+    return (
+        f"{prompt}\n\n"
+        "Current environment, read while the command was spoken "
+        "(call get_environment only if you need something newer or missing here):\n"
+        f"{json.dumps(environment)}"
+    )
+
+
+async def run_fast_path(server, plan):
+    """
+    Run an unambiguous command straight through the MCP session, without the LLM.
+    Returns the (tool name, arguments, result) calls made, or None if a call failed.
+    """
+    with tracer.span("fast_path"):
+        results = []
+        for name, args in plan:
+            result = await server.call_tool(name, args)
+            if result.isError:
+                print(f"[WARN] Fast path call {name} failed, handing over to the agent: {tool_result(result)}")
+                return None
+            results.append((name, args, tool_result(result)))
+    return results
+
+
+async def replay_plan(server, calls):
+    """
+    Replay the tool calls the agent made the last time this command was given.
+    Returns the (tool name, arguments, result) calls made, or None if a call failed (the environment no longer
+    fits the plan).
+    """
+    with tracer.span("plan_replay"):
+        ids = {}  # Swarm IDs created by the recorded plan -> the ones created now
+        results = []
+        for name, recorded_args, recorded_result in calls:
+            args = substitute(recorded_args, ids)
+            result = await server.call_tool(name, args)
+            value = tool_result(result)
+            if result.isError or failed(value, recorded_result):
+                print(f"[WARN] Cached plan call {name} failed, handing over to the agent: {value}")
+                return None
+            new_id = created_id(recorded_args, recorded_result)
+            if new_id is not None:
+                ids[new_id] = value
+            results.append((name, args, value))
+    return results
+
+
+async def run_agent(agent, prompt, utterance_id, environment, cacheable):
+    print(f"🤖 Running agent with input: {prompt}")
+    calls = []
+    recorded_calls.set(calls)
+    try:
+        current_input = agent_input(prompt, environment if prefetch_enabled else None)
+        with tracer.span("agent_run", utterance_id):
+            result = await Runner.run(
+                starting_agent=agent,
+                input=session_memory.messages(current_input) if session_memory is not None else current_input,
+            )
+    finally:
+        recorded_calls.set(None)
+    print(f"🤖 Agent output: {result.final_output}\n")
+    succeeded = [(name, args, value) for name, args, value, is_error in calls if not is_error]
+    # Only plans that went through without errors are worth repeating
+    if cacheable and environment is not None and len(succeeded) == len(calls):
+        plan_cache.put(prompt, environment, succeeded)
+    return result.final_output, succeeded
+
+
+async def handle_utterance(agent, server, utterance_id, prompt, prefetch):
+    global handled_utterances
+    try:
+        current_utterance.set(utterance_id)
+        plan = intent_parser.parse(prompt) if intent_parser is not None else None
+        environment = await prefetched_environment(prefetch) if prefetch is not None else None
+        if environment is None and (prefetch_enabled or plan is not None or plan_cache is not None):
+            environment = await read_environment(server)
+        # With memory, "send them back" depends on earlier commands, a plan recorded for it can't be reused
+        cacheable = plan_cache is not None and not (session_memory is not None and refers_to_context(prompt))
+        results = None
+        if environment is not None:
+            # The sketch doesn't validate IDs itself, so a misheard ID must never reach it
+            if plan is not None and check_ids(plan, environment):
+                results = await run_fast_path(server, plan)
+                if results is not None:
+                    print(f"⚡ Fast path: {'; '.join(describe_call(*call) for call in results)}\n")
+                else:
+                    # Calls before the failed one have run, the snapshot no longer describes the environment
+                    environment = await read_environment(server)
+            if results is None and cacheable and environment is not None:
+                calls = plan_cache.get(prompt, environment)
+                if calls is not None:
+                    results = await replay_plan(server, calls)
+                    if results is None:
+                        plan_cache.invalidate(prompt)
+                        # Same here, the agent (and the plan cached from its run) must start from the current state
+                        environment = await read_environment(server)
+                    else:
+                        print(f"♻️  Replayed cached plan: {'; '.join(describe_call(*call) for call in results)}\n")
+        output = None
+        if results is None:
+            output, results = await run_agent(agent, prompt, utterance_id, environment, cacheable)
+        if session_memory is not None:
+            session_memory.record(prompt, output, results, environment)
+    finally:
+        # Even a cancelled run may have changed the environment
+        handled_utterances += 1
+
+
+def is_command(text):
+    # A complete command the fast path understands, tells "wait send Bravo-0 to Alpha-0" from "stop Alpha-0 ..."
+    return intent_parser is not None and intent_parser.parse(text) is not None
+
+
+# Agent worker (async), hands transcriptions to the scheduler, which runs them as its policy allows
+async def agent_worker(agent, server):
+    scheduler = AgentScheduler(
+        lambda *utterance: handle_utterance(agent, server, *utterance),
+        schedule_policy,
+        MAX_PENDING_UTTERANCES,
+        is_command,
+    )
+    runner = asyncio.create_task(scheduler.run())
+    print(f"[INFO] Agent is ready and waiting for transcriptions ({schedule_policy} scheduling)...")
     ready_event.set()  # Signal that agent is ready
-    while True:
-        prompt = await transcription_queue.get()
-        print(f"🤖 Running agent with input: {prompt}")
-        result = await Runner.run(starting_agent=agent, input=prompt)
-        print(f"🤖 Agent output: {result.final_output}\n")
-        transcription_queue.task_done()
+    try:
+        while True:
+            utterance = await transcription_queue.get()
+            await scheduler.submit(utterance)  # Waits while the scheduler's queue is full
+            transcription_queue.task_done()
+    finally:
+        runner.cancel()
 
 
-# Main async entry point
-async def main():
+def add_pipeline_args(parser):
+    # How utterances are turned into tool calls, shared with benchmark/run_benchmark.py
+    parser.add_argument(
+        "--no-fast-path",
+        action="store_true",
+        help="Send every utterance to the agent, even commands that map directly onto a tool call",
+    )
+    parser.add_argument(
+        "--schedule",
+        choices=POLICIES,
+        default="correction",
+        help="How newer utterances affect earlier ones still queued or running: fifo runs everything in order, "
+        "correction lets 'no, ... instead' cancel or replace the command it corrects, latest only runs the newest",
+    )
+    parser.add_argument(
+        "--memory-tokens",
+        type=int,
+        default=2000,
+        help="Token budget for remembering earlier commands (recent ones in full, older ones summarized), "
+        "0 to send every command to the agent on its own",
+    )
+    parser.add_argument(
+        "--no-prefetch",
+        action="store_true",
+        help="Let the agent read the environment itself instead of reading it while [SPACE] is held",
+    )
+    parser.add_argument(
+        "--plan-cache-size",
+        type=int,
+        default=128,
+        help="Commands whose tool calls are remembered and replayed when repeated, 0 to disable",
+    )
+    parser.add_argument(
+        "--plan-cache-age",
+        type=float,
+        default=600,
+        help="Seconds a remembered plan may be replayed for",
+    )
+
+
+def parse_args():
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "--mcp-url",
         required=True,
         help="Base URL for the MCP server (without /sse)",
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Transcribe while [SPACE] is held, so only the last words are left to decode on release",
+    )
+    parser.add_argument(
+        "--stream-interval",
+        type=float,
+        default=1.0,
+        help="Seconds between partial transcriptions in streaming mode",
+    )
+    parser.add_argument(
+        "--transcribe-workers",
+        type=int,
+        default=2,
+        help="Number of Whisper worker processes, each loads its own copy of the model",
+    )
+    add_pipeline_args(parser)
+    parser.add_argument(
+        "--trace-file", help="Append a JSON line per timed stage to this file"
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="Serve stage latency histograms at http://localhost:<port>/metrics",
+    )
+    return parser.parse_args()
+
+
+class TracedMCPServerSse(MCPServerSse):
+    """
+    MCPServerSse that times every tool call and sends the current utterance ID along in the request's _meta,
+    so the MCP server can tag its own spans (and the browser commands it sends) with it.
+    Calls are retried like the SDK's own (max_retry_attempts, retry_backoff_seconds_base).
+    """
+
+    async def call_tool(self, tool_name, arguments):
+        utterance_id = current_utterance.get()
+        with tracer.span("mcp_tool_call", utterance_id, tool=tool_name):
+            session = self.session
+            if session is None:
+                return await super().call_tool(tool_name, arguments)  # Raises the SDK's not-connected error
+            result = await self._run_with_retries(
+                lambda: session.call_tool(tool_name, arguments, meta={"utterance_id": utterance_id})
+            )
+        calls = recorded_calls.get()
+        if calls is not None:
+            calls.append((tool_name, arguments, tool_result(result), result.isError))
+        return result
+
+
+# Startup phases, run concurrently by main()
+def start_transcription_pool(num_workers):
+    global transcription_pool
+    transcription_pool = TranscriptionPool(num_workers)
+    transcription_pool.start()
+    transcription_pool.wait_until_ready()
+
+
+def open_audio_stream():
+    global stream
+    import sounddevice as sd  # Only needed with a microphone, the benchmark imports this module without one
+
+    stream = sd.InputStream(
+        samplerate=SAMPLE_RATE, channels=CHANNELS, callback=audio_callback
+    )
+    stream.start()
+
+
+async def connect_mcp_server(server):
+    await server.connect()
+    return await server.list_tools()
+
+
+def build_agent(server, model=None):
+    return Agent(
+        name="Assistant",
+        instructions=(
+            "Use the tools to execute the command, then provide a summary of all the steps you took. "
+            "When the command comes with the current environment, use it rather than reading it again."
+        ),
+        mcp_servers=[server],
+        model=model,  # The default model unless given, the benchmark passes a scripted one
+        # Independent tool calls of one turn run concurrently, the MCP server pipelines them to the browser
+        model_settings=ModelSettings(tool_choice="required", parallel_tool_calls=True),
+    )
+
+
+def configure_pipeline(args, server, tools):
+    # Set up the fast path, plan cache, session memory, prefetch and scheduling as add_pipeline_args asked
+    global intent_parser, plan_cache, session_memory, mcp_server, prefetch_enabled, schedule_policy
+    if not args.no_fast_path:
+        intent_parser = IntentParser(tools)
+        print(f"[INFO] Fast path enabled ({len(intent_parser.grammar)} command phrases).")
+    if args.plan_cache_size > 0:
+        plan_cache = PlanCache(args.plan_cache_size, args.plan_cache_age)
+    if args.memory_tokens > 0:
+        session_memory = SessionMemory(args.memory_tokens)
+    prefetch_enabled = not args.no_prefetch
+    schedule_policy = args.schedule
+    mcp_server = server
+
+
+async def timed_phase(name, timings, phase):
+    phase_start = time.perf_counter()
+    result = await phase
+    timings[name] = time.perf_counter() - phase_start
+    return result
+
+
+# Main async entry point
+async def main(args):
     mcp_url = args.mcp_url
-    print("[INFO] Loading agent and connecting to MCP server...")
-    async with MCPServerSse(
+    server = TracedMCPServerSse(
         name="SSE Custom Server",
         params={"url": mcp_url + "/sse"},
-        client_session_timeout_seconds=60 * 10,
-    ) as server:
-        agent = Agent(
-            name="Assistant",
-            instructions="Use the tools to execute the command, then provide a summary of all the steps you took.",
-            mcp_servers=[server],
-            model_settings=ModelSettings(tool_choice="required"),
+        client_session_timeout_seconds=60,  # Backstop only, the servers fail tool calls well before this
+        cache_tools_list=True,  # Reuse the tool list fetched at startup for every agent run
+    )
+    try:
+        print("[INFO] Loading Whisper workers, connecting to MCP server and opening audio device...")
+        startup_start = time.perf_counter()
+        timings = {}
+        _, tools, _ = await asyncio.gather(
+            timed_phase(
+                "Whisper workers",
+                timings,
+                asyncio.to_thread(start_transcription_pool, args.transcribe_workers),
+            ),
+            timed_phase("MCP session and tool list", timings, connect_mcp_server(server)),
+            timed_phase("Audio device", timings, asyncio.to_thread(open_audio_stream)),
         )
-        print("[INFO] Agent loaded and connected to MCP server.")
-        await agent_worker(agent)
+        print("[INFO] Startup timing:")
+        for name, seconds in timings.items():
+            print(f"    {name:<28}{seconds:6.2f}s")
+        print(f"    {'Ready after':<28}{time.perf_counter() - startup_start:6.2f}s")
+
+        agent = build_agent(server)
+        print(f"[INFO] Agent loaded and connected to MCP server ({len(tools)} tools).")
+        configure_pipeline(args, server, tools)
+        await agent_worker(agent, server)
+    finally:
+        await server.cleanup()
 
 
 # Start the agent event loop in a background thread
-def start_agent_loop():
+def start_agent_loop(args):
     global agent_loop
     agent_loop = asyncio.new_event_loop()
     asyncio.set_event_loop(agent_loop)
-    agent_loop.run_until_complete(main())
+    agent_loop.run_until_complete(main(args))
 
 
 if __name__ == "__main__":
+    from pynput import keyboard  # Only needed for push to talk, the benchmark imports this module without it
+
+    args = parse_args()
+    tracer.configure("voice-agent", args.trace_file, args.metrics_port)
+    if args.streaming:
+        stream_interval = args.stream_interval
     # Start agent loop in background thread
     agent_loop = None
-    threading.Thread(target=start_agent_loop, daemon=True).start()
+    threading.Thread(target=start_agent_loop, args=(args,), daemon=True).start()
     # Start transcription worker thread
     threading.Thread(target=transcribe_worker, daemon=True).start()
-    # Start audio stream in main thread
-    stream = sd.InputStream(
-        samplerate=SAMPLE_RATE, channels=CHANNELS, callback=audio_callback
-    )
-    stream.start()
     # Wait until agent is ready before starting keyboard listener and printing prompt
     ready_event.wait()
     print("[INFO] Whisper model and agent are ready.")
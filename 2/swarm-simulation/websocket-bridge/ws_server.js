@@ -1,7 +1,96 @@
 const WebSocket = require("ws");
-const wss = new WebSocket.Server({ port: 8765 });
+const MsgPack = require("../sketch/msgpack.js");
 
-const connections = {};
+// Large messages (get_environment replies, pushed snapshots) are deflated, small commands are not worth it
+const wss = new WebSocket.Server({
+    port: 8765,
+    perMessageDeflate: { threshold: 1024, zlibDeflateOptions: { level: 1 } },
+});
+
+const connections = {}; // only the browser, any number of python clients (MCP servers, benchmarks) can connect
+const pythonClients = new Set();
+// id sent to the browser -> { socket: python socket waiting for the reply, clientId: the id it used, sent: time forwarded }
+const pending = new Map();
+let nextBridgeId = 0;
+
+// Clients that list "msgpack" in the "encodings" of their handshake get binary MessagePack frames,
+// everyone else gets JSON text like before. Incoming frames are decoded by their type.
+function decode(data, isBinary) {
+    return isBinary ? MsgPack.decode(data) : JSON.parse(data.toString());
+}
+
+// Every message starts with the small fields the bridge routes by (id, command, utterance_id or push), so
+// they can be read off the first bytes of a frame. JSON_FIELD matches one "key": scalar pair.
+const JSON_PEEK_BYTES = 256;
+const JSON_FIELD = /\s*("(?:[^"\\]|\\.)*")\s*:\s*(null|true|false|-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|"(?:[^"\\]|\\.)*")\s*[,}]/y;
+
+function peek(data, isBinary) {
+    if (isBinary) return MsgPack.peek(data);
+    const text = data.toString("utf8", 0, Math.min(data.length, JSON_PEEK_BYTES));
+    const fields = {};
+    const start = text.match(/^\s*\{/);
+    if (!start) return fields;
+    JSON_FIELD.lastIndex = start[0].length;
+    let match;
+    while ((match = JSON_FIELD.exec(text)) !== null) fields[JSON.parse(match[1])] = JSON.parse(match[2]);
+    return fields;
+}
+
+// A received frame: its bytes, the fields peeked from its start, and the whole message, decoded only when
+// it has to be re-encoded (a different encoding on the other side, or a swapped id)
+function frameOf(data, isBinary) {
+    let message;
+    return {
+        data,
+        isBinary,
+        fields: peek(data, isBinary),
+        message: () => (message === undefined ? (message = decode(data, isBinary)) : message),
+    };
+}
+
+function send(socket, message) {
+    if (socket.msgpack) socket.send(MsgPack.encode(message));
+    else socket.send(JSON.stringify(message));
+}
+
+// Pass the sender's bytes through untouched when the receiver uses the same encoding
+function forward(socket, frame) {
+    if (socket.msgpack === frame.isBinary) socket.send(frame.data, { binary: frame.isBinary });
+    else send(socket, frame.message());
+}
+
+function broadcastToPython(frame) {
+    for (const client of pythonClients) forward(client, frame);
+}
+
+// Replies are routed back by request id. Clients pick their own ids, the bridge only swaps in one of its own
+// (and swaps it back in the reply) when a request has none (older clients) or another client already has
+// that id in flight.
+function forwardRequest(socket, frame, clientId) {
+    let wireId = clientId;
+    if (wireId === undefined || wireId === null || pending.has(wireId)) {
+        wireId = `bridge-${nextBridgeId++}`;
+    }
+    if (wireId === clientId) forward(connections.browser, frame);
+    else send(connections.browser, { ...frame.message(), id: wireId });
+    pending.set(wireId, { socket, clientId, sent: Date.now() });
+}
+
+function routeReply(frame, wireId) {
+    const request = pending.get(wireId);
+    if (!request) return;
+    pending.delete(wireId);
+    console.log(`[OUT] to agent after ${Date.now() - request.sent} ms: #${request.clientId}, ${frame.data.length} bytes`); // Log outgoing to agent
+    if (request.socket.readyState !== WebSocket.OPEN) return;
+    try {
+        if (request.clientId === wireId) forward(request.socket, frame);
+        else send(request.socket, { ...frame.message(), id: request.clientId });
+    } catch (e) {
+        // The caller is still waiting for an answer
+        console.log(`[WARN] Could not decode the reply to #${request.clientId}: ${e}`);
+        send(request.socket, { id: request.clientId, error: `Could not decode the browser's reply: ${e.message}` });
+    }
+}
 
 wss.on("connection", (socket) => {
     let role = null;
@@ -11,8 +100,14 @@ wss.on("connection", (socket) => {
             const reg = JSON.parse(msg.toString());
             if (reg.role === "browser" || reg.role === "python") {
                 role = reg.role;
-                connections[role] = socket;
-                console.log(`${role} connected.`);
+                socket.msgpack = Array.isArray(reg.encodings) && reg.encodings.includes("msgpack");
+                if (role === "browser") connections.browser = socket;
+                else pythonClients.add(socket);
+                console.log(`${role} connected (${socket.msgpack ? "msgpack" : "json"}).`);
+                if (role === "browser") {
+                    // Lets the servers renew subscriptions a reloaded sketch has forgotten
+                    for (const client of pythonClients) send(client, { event: "browser_connected" });
+                }
             } else {
                 socket.close();
                 return;
@@ -23,17 +118,51 @@ wss.on("connection", (socket) => {
         }
 
         if (role === "python") {
-            socket.on("message", (msg) => {
-                if (!connections.browser) {
-                    socket.send(JSON.stringify({ error: "No browser connected" }));
+            socket.on("message", (msg, isBinary) => {
+                let request = {};
+                try {
+                    const frame = frameOf(msg, isBinary);
+                    request = frame.fields;
+                    // Clients that don't put the command up front are decoded in full
+                    if (request.command === undefined) request = frame.message();
+                    if (!connections.browser) {
+                        send(socket, { id: request.id, error: "No browser connected" });
+                        return;
+                    }
+                    console.log(`[IN] from agent (utterance ${request.utterance_id}): ${request.command} #${request.id}, ${msg.length} bytes`); // Log incoming from agent
+                    forwardRequest(socket, frame, request.id);
+                } catch (e) {
+                    console.log(`[WARN] Could not decode a request from an agent: ${e}`);
+                    if (request.id !== undefined) {
+                        send(socket, { id: request.id, error: `Could not decode the request: ${e.message}` });
+                    }
+                }
+            });
+        }
+
+        if (role === "browser") {
+            // Replies carry the id of their request, so many requests can be in flight at once
+            socket.on("message", (response, isBinary) => {
+                let frame;
+                try {
+                    frame = frameOf(response, isBinary);
+                    if (frame.fields.push === undefined && frame.fields.id === undefined) {
+                        frame.fields = frame.message();
+                    }
+                } catch (e) {
+                    console.log(`[WARN] Could not decode a message from the browser: ${e}`);
                     return;
                 }
-                console.log(`[IN] from agent:`, msg.toString()); // Log incoming from agent
-                connections.browser.send(msg.toString());
-                connections.browser.once("message", (response) => {
-                    console.log(`[OUT] to agent:`, response.toString()); // Log outgoing to agent
-                    socket.send(response.toString());
-                });
+                if (frame.fields.push) {
+                    // Unrequested snapshots (see subscribe_environment in mcp.js), passed on without logging
+                    try {
+                        broadcastToPython(frame);
+                    } catch (e) {
+                        console.log(`[WARN] Could not decode a ${frame.fields.push} push: ${e}`);
+                    }
+                    return;
+                }
+                routeReply(frame, frame.fields.id);
             });
         }
     });
@@ -41,9 +170,22 @@ wss.on("connection", (socket) => {
     socket.on("close", () => {
         if (role) {
             console.log(`${role} disconnected.`);
-            if (connections[role] === socket) {
-                delete connections[role];
+            if (role === "python") {
+                pythonClients.delete(socket);
+                // Drop requests whose python client went away
+                for (const [id, request] of pending) {
+                    if (request.socket === socket) pending.delete(id);
+                }
+            } else if (connections.browser === socket) {
+                delete connections.browser;
+                // Their replies will never come, tell the callers instead of leaving them waiting
+                for (const request of pending.values()) {
+                    if (request.socket.readyState === WebSocket.OPEN) {
+                        send(request.socket, { id: request.clientId, error: "Browser disconnected" });
+                    }
+                }
+                pending.clear();
             }
         }
     });
-});
\ No newline at end of file
+});